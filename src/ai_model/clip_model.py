@@ -1,6 +1,7 @@
 import torch
 import open_clip
 from PIL import Image
+from loader import imagebatch
 
 def load_model():
     """
@@ -23,3 +24,13 @@ def extract_features(image_path, model, preprocess):
         features = model.encode_image(img_tensor)
     
     return features[0].numpy()  # Shape: (512,)
+
+def extract_features_batch(image_paths, model, preprocess, batch_size=imagebatch.DEFAULT_BATCH_SIZE,
+                           num_workers=imagebatch.DEFAULT_NUM_WORKERS, on_error=None):
+    """
+    Extract CLIP feature vectors for many images, one forward pass per batch.
+
+    See image_batch.extract_features_batch; images that cannot be decoded
+    yield None and are passed to on_error(path, exception).
+    """
+    return imagebatch.extract_features_batch(image_paths, model.encode_image, preprocess, batch_size, num_workers, on_error)
@@ -1,6 +1,13 @@
 from transformers import AutoTokenizer, AutoModel
+import os
 import torch
 
+from loader import textwindows
+
+WINDOW_TOKENS = 512  # model limit, including the [CLS] and [SEP] tokens added to every window
+WINDOW_STRIDE = 384  # tokens between the starts of consecutive windows; the remaining 126 overlap
+WINDOW_BATCH_SIZE = 8  # windows per forward pass
+
 def load_model():
     """
     Load CodeBERT model and tokenizer (base).
@@ -15,20 +22,62 @@ def read_code_from_file(file_path):
     """
     Read raw code from file.
     """
-    with open(file_path, "r", encoding="utf-8") as f:
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
         return f.read()
 
 
-def extract_features_from_file(file_path, tokenizer, model):
+def iter_token_windows(blocks, tokenizer, window=WINDOW_TOKENS - 2, stride=WINDOW_STRIDE):
     """
-    Encode the file content and return the CLS embedding as feature vector.
+    Turn a stream of text blocks into overlapping windows of token ids (without special tokens).
     """
-    code = read_code_from_file(file_path)
-    inputs = tokenizer(code, return_tensors="pt", truncation=True, max_length=512)
-    
+    return textwindows.iter_token_windows(blocks, tokenizer, window, stride)
+
+
+def _embed_batch(batch, tokenizer, model):
+    length = max(len(ids) for ids in batch)
+    input_ids = torch.full((len(batch), length), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    for i, ids in enumerate(batch):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[i, :len(ids)] = 1
     with torch.no_grad():
-        outputs = model(**inputs)
-    
-    # Use [CLS] token representation as embedding
-    cls_embedding = outputs.last_hidden_state[:, 0, :]  # shape: [1, 768]
-    return cls_embedding.squeeze().numpy()
\ No newline at end of file
+        outputs = model(input_ids=input_ids, attention_mask=attention_mask)
+    return outputs.last_hidden_state[:, 0, :].numpy()  # [CLS] per window
+
+
+def iter_window_features(windows, tokenizer, model, batch_size=WINDOW_BATCH_SIZE):
+    """
+    Embed token windows in batches and yield one [CLS] vector per window, in order.
+    """
+    batch = []
+    for ids in windows:
+        batch.append([tokenizer.cls_token_id] + list(ids) + [tokenizer.sep_token_id])
+        if len(batch) == batch_size:
+            yield from _embed_batch(batch, tokenizer, model)
+            batch = []
+    if batch:
+        yield from _embed_batch(batch, tokenizer, model)
+
+
+def extract_features_from_text(text, tokenizer, model, return_windows=False):
+    """
+    Encode a text in overlapping 512-token windows and return the mean of their [CLS] embeddings.
+
+    Texts that fit in one window give the same vector as encoding them whole.
+    """
+    windows = iter_token_windows([text], tokenizer)
+    return textwindows.pool_windows(iter_window_features(windows, tokenizer, model), return_windows)
+
+
+def extract_features_from_file(file_path, tokenizer, model, return_windows=False):
+    """
+    Encode the file content and return the mean [CLS] embedding of its token windows as feature vector.
+
+    Nothing past 512 tokens is truncated any more: long files are read in
+    blocks and embedded window by window, so memory stays bounded however large
+    the file is (unless return_windows asks for every window vector as well).
+    """
+    if os.path.getsize(file_path) <= textwindows.READ_BLOCK_CHARS:
+        return extract_features_from_text(read_code_from_file(file_path), tokenizer, model, return_windows)
+    windows = iter_token_windows(textwindows.iter_text_blocks(file_path), tokenizer)
+    return textwindows.pool_windows(iter_window_features(windows, tokenizer, model), return_windows)
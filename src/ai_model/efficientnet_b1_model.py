@@ -4,6 +4,7 @@ import torch
 import torchvision.models as models
 import torchvision.transforms as transforms
 from PIL import Image
+from loader import imagebatch
 
 def load_model():
     model = models.efficientnet_b1(weights=models.EfficientNet_B1_Weights.DEFAULT)
@@ -21,4 +22,14 @@ def extract_features(image_path, model, transform):
     with torch.no_grad():
         features = model(img_tensor)  # Output shape: [1, 1280]
     
-    return features.view(-1).numpy()
\ No newline at end of file
+    return features.view(-1).numpy()
+
+def extract_features_batch(image_paths, model, transform, batch_size=imagebatch.DEFAULT_BATCH_SIZE,
+                           num_workers=imagebatch.DEFAULT_NUM_WORKERS, on_error=None):
+    """
+    Extract EfficientNet-B1 feature vectors for many images, one forward pass per batch.
+
+    See image_batch.extract_features_batch; images that cannot be decoded
+    yield None and are passed to on_error(path, exception).
+    """
+    return imagebatch.extract_features_batch(image_paths, model, transform, batch_size, num_workers, on_error)
@@ -0,0 +1,67 @@
+import torch
+from PIL import Image
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_BATCH_SIZE = 16
+DEFAULT_NUM_WORKERS = 4
+
+def load_image_tensor(image_path, transform):
+    """
+    Decode an image as RGB and apply the model's preprocessing; errors propagate to the caller.
+    """
+    with Image.open(image_path) as img:
+        return transform(img.convert('RGB'))
+
+def _load_or_error(image_path, transform):
+    try:
+        return load_image_tensor(image_path, transform), None
+    except Exception as e:
+        return None, e
+
+def extract_features_batch(image_paths, forward, transform, batch_size=DEFAULT_BATCH_SIZE,
+                           num_workers=DEFAULT_NUM_WORKERS, on_error=None):
+    """
+    Extract feature vectors for many images, one forward pass per batch.
+
+    Images are decoded and preprocessed in worker threads while the previous
+    batch runs through the model.
+
+    Args:
+        image_paths (list): Images to embed.
+        forward (callable): Maps an (B x 3 x H x W) tensor to a (B x ...) feature tensor,
+            e.g. `model` or `model.encode_image`.
+        transform (callable): The model's preprocessing.
+        on_error (callable): Called as on_error(path, exception) for every image that cannot be decoded.
+
+    Returns:
+        list: One flat numpy vector per image, aligned with image_paths; None for images that failed.
+    """
+    features = [None] * len(image_paths)
+    batches = [range(start, min(start + batch_size, len(image_paths)))
+               for start in range(0, len(image_paths), batch_size)]
+
+    with ThreadPoolExecutor(max_workers=num_workers) as pool:
+        def submit(batch):
+            return [pool.submit(_load_or_error, image_paths[i], transform) for i in batch]
+
+        pending = submit(batches[0]) if batches else []
+        for b, batch in enumerate(batches):
+            results = [future.result() for future in pending]
+            if b + 1 < len(batches):
+                pending = submit(batches[b + 1])  # decode the next batch during this forward pass
+
+            loaded = []
+            for i, (tensor, error) in zip(batch, results):
+                if tensor is not None:
+                    loaded.append((i, tensor))
+                elif on_error is not None:
+                    on_error(image_paths[i], error)
+            if not loaded:
+                continue
+            inputs = torch.stack([tensor for _, tensor in loaded])
+            with torch.inference_mode():
+                output = forward(inputs)
+            for (i, _), vec in zip(loaded, output.reshape(len(loaded), -1).numpy()):
+                features[i] = vec
+
+    return features
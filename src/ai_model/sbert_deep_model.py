@@ -1,6 +1,13 @@
 # src/text_model/sbert_deep_model.py
 
 from sentence_transformers import SentenceTransformer
+import os
+import torch
+
+from loader import textwindows
+
+WINDOW_OVERLAP = 0.25  # share of each window repeated at the start of the next one
+WINDOW_BATCH_SIZE = 16  # windows per forward pass
 
 def load_model():
     """
@@ -9,10 +16,66 @@ def load_model():
     return SentenceTransformer('all-mpnet-base-v2')
 
 def read_text_from_file(file_path):
-    with open(file_path, 'r', encoding='utf-8') as f:
+    with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
         return f.read()
 
-def extract_features_from_file(file_path, model):
-    text = read_text_from_file(file_path)
-    embedding = model.encode(text, convert_to_numpy=True)
-    return embedding
\ No newline at end of file
+def _window_size(model):
+    return model.max_seq_length - 2  # room for the start and end tokens
+
+def iter_token_windows(blocks, model):
+    """
+    Splits a stream of text blocks into overlapping windows of token ids that fit model.max_seq_length.
+
+    Only the current window and one block of tokens are held in memory.
+    """
+    window = _window_size(model)
+    stride = max(1, int(window * (1 - WINDOW_OVERLAP)))
+    return textwindows.iter_token_windows(blocks, model.tokenizer, window, stride)
+
+def _embed_batch(batch, model):
+    # Token ids go straight to the model: decoding a window and letting model.encode tokenize it
+    # again does not give back the same ids and could push the window past max_seq_length.
+    tokenizer = model.tokenizer
+    batch = [tokenizer.build_inputs_with_special_tokens(list(ids)) for ids in batch]
+    length = max(len(ids) for ids in batch)
+    input_ids = torch.full((len(batch), length), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros_like(input_ids)
+    for i, ids in enumerate(batch):
+        input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[i, :len(ids)] = 1
+    with torch.no_grad():
+        features = model({"input_ids": input_ids.to(model.device), "attention_mask": attention_mask.to(model.device)})
+    return features["sentence_embedding"].cpu().numpy()
+
+def iter_window_features(windows, model, batch_size=WINDOW_BATCH_SIZE):
+    """
+    Embeds token windows in batches and yields one sentence embedding per window, in order.
+    """
+    batch = []
+    for ids in windows:
+        batch.append(ids)
+        if len(batch) == batch_size:
+            yield from _embed_batch(batch, model)
+            batch = []
+    if batch:
+        yield from _embed_batch(batch, model)
+
+def extract_features_from_text(text, model, return_windows=False):
+    """
+    Embeds a text whole if it fits model.max_seq_length, otherwise as the mean of overlapping windows.
+    """
+    n_tokens = len(model.tokenizer(text, add_special_tokens=False, verbose=False)["input_ids"])
+    if n_tokens <= _window_size(model):
+        embedding = model.encode(text, convert_to_numpy=True)
+        return (embedding, embedding[None, :]) if return_windows else embedding
+    return textwindows.pool_windows(iter_window_features(iter_token_windows([text], model), model), return_windows)
+
+def extract_features_from_file(file_path, model, return_windows=False):
+    """
+    Embeds a file without truncating it: long files are read in blocks and
+    encoded window by window, so memory stays bounded for multi-GB logs.
+    """
+    if os.path.getsize(file_path) <= textwindows.READ_BLOCK_CHARS:
+        return extract_features_from_text(read_text_from_file(file_path), model, return_windows)
+    windows = iter_token_windows(textwindows.iter_text_blocks(file_path), model)
+    return textwindows.pool_windows(iter_window_features(windows, model), return_windows)
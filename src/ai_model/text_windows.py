@@ -0,0 +1,65 @@
+import numpy as np
+
+READ_BLOCK_CHARS = 1024 * 1024  # characters read and tokenized at a time from large files
+
+def iter_text_blocks(file_path, block_chars=READ_BLOCK_CHARS):
+    """
+    Read a file as text blocks of about `block_chars` characters, cut at whitespace so no word is split.
+
+    Invalid UTF-8 bytes are dropped, as in TextCache, so one bad byte does not lose the file.
+    """
+    with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+        carry = ""
+        while block := f.read(block_chars):
+            block = carry + block
+            cut = max(block.rfind(" "), block.rfind("\n"))
+            if cut <= 0:
+                carry = ""
+                yield block
+            else:
+                carry = block[cut:]
+                yield block[:cut]
+        if carry:
+            yield carry
+
+
+def iter_token_windows(blocks, tokenizer, window, stride):
+    """
+    Turn a stream of text blocks into overlapping windows of `window` token ids (without special tokens).
+
+    Consecutive windows start `stride` tokens apart. Only the current window
+    and one block of tokens are held in memory. Every token ends up in at
+    least one window; an empty text gives one empty window.
+    """
+    buffer = []
+    emitted = False
+    for block in blocks:
+        buffer.extend(tokenizer(block, add_special_tokens=False, verbose=False)["input_ids"])
+        while len(buffer) >= window:
+            yield buffer[:window]
+            emitted = True
+            del buffer[:stride]
+    if not emitted or len(buffer) > window - stride:
+        yield buffer
+
+
+def pool_windows(vectors, return_windows=False):
+    """
+    Mean-pool window vectors as they arrive.
+
+    Returns:
+        The mean vector, or (mean, per-window matrix) with return_windows. Only
+        the running sum is kept unless the per-window vectors are requested;
+        the duplicate scanner uses the mean only, the per-window matrix is for
+        callers that want to see which part of a file matches.
+    """
+    total = None
+    count = 0
+    windows = []
+    for vec in vectors:
+        total = vec.astype(np.float64) if total is None else total + vec
+        count += 1
+        if return_windows:
+            windows.append(vec)
+    mean = (total / count).astype(np.float32)
+    return (mean, np.stack(windows)) if return_windows else mean
@@ -1,8 +1,11 @@
 import os
+import re
+import json
+import shutil
+import time
 from datetime import datetime
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from loader import clip_model, sbert_deep_model, codebert_model, utilhash
+from loader import clip_model, sbert_deep_model, codebert_model, utilhash, digestcache, simengine, quantize, model_registry
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 BASE_REPORTS_DIR = os.path.join(BASE_DIR, "reports")
@@ -12,6 +15,13 @@ REPORT_DIR = os.path.join(BASE_REPORTS_DIR, "diffs")
 os.makedirs(SNAPSHOT_DIR, exist_ok=True)
 os.makedirs(REPORT_DIR, exist_ok=True)
 
+SNAPSHOT_EXT = ".snap"  # binary snapshot directory; ".txt" snapshots are the legacy text format
+SNAPSHOT_FORMAT_VERSION = 3  # version 1 kept the path table in manifest.json, version 2 had no int8; both readable
+SNAPSHOT_WINDOW = 512  # files (or same-path diff rows) processed per batch when streaming
+SNAPSHOT_EXTENSIONS = (SNAPSHOT_EXT, ".txt")
+RENAME_MIN_SIMILARITY = 0.98  # embedding similarity needed to pair a NEW file with a DELETED one
+UNCHANGED_SIMILARITY = 1 - 1e-6  # highest usable diff threshold: identical float32 vectors can score 0.99999994
+
 def status(msg):
     print(f"[*] {msg}")
 
@@ -53,33 +63,34 @@ def sanitize_path(path):
 def generate_snapshot_filename(folder_path):
     now = datetime.now()
     folder_id = sanitize_path(folder_path)
-    return f"{folder_id}_{now.strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+    return f"{folder_id}_{now.strftime('%Y-%m-%d_%H-%M-%S')}{SNAPSHOT_EXT}"
 
 def extract_timestamp_from_name(filename):
     try:
-        time_str = "_".join(filename.split("_")[-2:]).replace(".txt", "")
+        time_str = "_".join(os.path.splitext(filename)[0].split("_")[-2:])
         return datetime.strptime(time_str, "%Y-%m-%d_%H-%M-%S")
     except Exception:
         return None
 
 def load_model_for_type(file_type, file_path=None):
+    # Models come from the shared registry, so each one is loaded once per process.
     if file_type == "image":
         try:
-            model, preprocess = clip_model.load_model()
+            model, preprocess = model_registry.get_model("clip")
             return model, preprocess, clip_model
         except:
             return None, None, None
     elif file_type == "text":
         if file_path and file_path.endswith((".sh", ".py", ".c", ".cpp", ".java", ".js")):
             try:
-                sbert = sbert_deep_model.load_model()
-                tokenizer, codebert = codebert_model.load_model()
+                sbert = model_registry.get_model("sbert_deep")
+                tokenizer, codebert = model_registry.get_model("codebert")
                 return (sbert, (tokenizer, codebert)), None, "hybrid"
             except:
                 return None, None, None
         else:
             try:
-                model = sbert_deep_model.load_model()
+                model = model_registry.get_model("sbert_deep")
                 return model, None, sbert_deep_model
             except:
                 return None, None, None
@@ -101,27 +112,243 @@ def hash_file(file_path, model, extra, module, file_type):
         return None
     return None
 
-def generate_snapshot(folder_path):
-    snapshot = {}
-    for root, _, files in os.walk(folder_path):
-        for file in files:
-            full_path = os.path.join(root, file)
-            file_type = detect_file_type(full_path)
+def snapshot_stat_key(st):
+    """Returns the (size, mtime_ns, inode) triple snapshots use to spot unchanged files (not digestcache.stat_key)."""
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+def _stable_stat_key(full_path, before):
+    # Not recorded if the file changed while it was read, or so recently that
+    # a further write might not move its mtime (same rule as the digest cache).
+    after = os.stat(full_path)
+    if (snapshot_stat_key(after) != snapshot_stat_key(before)
+            or time.time_ns() - after.st_mtime_ns < digestcache.RACY_WINDOW_NS):
+        return None
+    return snapshot_stat_key(after)
+
+def _reusable(entry, st, full_path, verify_unchanged):
+    if entry is None or entry.get("stat") is None or tuple(entry["stat"]) != snapshot_stat_key(st):
+        return False
+    if verify_unchanged:
+        return entry.get("partial") is not None and utilhash.compute_partial_hash(full_path) == entry["partial"]
+    return True
+
+def snapshot_sort_key(path):
+    """
+    Order in which binary snapshots store their paths: component by component,
+    which is also the order iter_folder_sorted walks a tree in.
+    """
+    return path.split(os.sep)
 
+def iter_folder_sorted(folder_path):
+    """Yields every regular file under folder_path in snapshot_sort_key order."""
+    try:
+        entries = sorted(os.scandir(folder_path), key=lambda entry: entry.name)
+    except OSError as e:
+        warning(f"Cannot list {folder_path} — {e}")
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_folder_sorted(entry.path)
+        elif entry.is_file():
+            yield entry.path
+
+def _build_entries(files, previous_entry, cache, hash_workers, verify_unchanged):
+    """
+    Computes snapshot entries for a batch of (path, stat) pairs.
+
+    Returns:
+        tuple: ({path: entry}, number of entries reused from the previous snapshot)
+    """
+    entries = {}
+    hash_stats = {}
+    reused = 0
+    # A file deleted or made unreadable after it was listed is skipped, not allowed to abort the snapshot.
+    for full_path, st in files:
+        try:
+            previous = previous_entry(full_path)
+            if _reusable(previous, st, full_path, verify_unchanged):
+                entries[full_path] = previous
+                reused += 1
+                continue
+
+            file_type = detect_file_type(full_path)
             if file_type in ["image", "text"]:
                 model, extra, module = load_model_for_type(file_type, full_path)
                 if model is None:
                     continue
                 vec = hash_file(full_path, model, extra, module, file_type)
                 if vec is not None:
-                    snapshot[full_path] = {"mode": "AI", "value": vec.tolist()}
+                    entries[full_path] = {
+                        "mode": "AI",
+                        "value": np.asarray(vec, dtype=np.float32),
+                        "partial": utilhash.compute_partial_hash(full_path),
+                        "stat": _stable_stat_key(full_path, st),
+                    }
             else:
-                file_hash = utilhash.compute_sha256(full_path)
-                snapshot[full_path] = {"mode": "HASH", "value": file_hash}
+                hash_stats[full_path] = st
+        except OSError as e:
+            warning(f"Snapshot skipped {full_path} — {e}")
+
+    for full_path, digests in utilhash.hash_files(list(hash_stats), ("sha256",), cache, hash_workers,
+                                                  on_error=lambda path, e: warning(f"Hashing failed on {path} — {e}")):
+        try:
+            entries[full_path] = {
+                "mode": "HASH",
+                "value": digests["sha256"],
+                "partial": utilhash.compute_partial_hash(full_path),
+                "stat": _stable_stat_key(full_path, hash_stats[full_path]),
+            }
+        except OSError as e:
+            warning(f"Snapshot skipped {full_path} — {e}")
+    return entries, reused
+
+def _with_stat(paths):
+    for full_path in paths:
+        try:
+            yield full_path, os.stat(full_path)
+        except OSError as e:
+            warning(f"Cannot stat {full_path} — {e}")
+
+def generate_snapshot(folder_path, cache=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS, previous=None,
+                      verify_unchanged=False):
+    """
+    Builds a snapshot of a folder: embeddings for images and text, SHA-256 for everything else.
+
+    With a `previous` snapshot, files whose (size, mtime, inode) still match
+    their previous entry keep it without being re-embedded or re-hashed.
+    verify_unchanged additionally requires their head/tail partial digest to
+    match, which catches content rewritten with the metadata preserved.
+
+    Returns:
+        dict: {path: {"mode", "value", "stat", "partial"}}
+    """
+    previous = previous or {}
+    paths = (os.path.join(root, file) for root, _, files in os.walk(folder_path) for file in files)
+    snapshot, reused = _build_entries(_with_stat(paths), previous.get, cache, hash_workers, verify_unchanged)
+    if previous:
+        status(f"Reused {reused} unchanged entries, processed {len(snapshot) - reused} new or modified files.")
     return snapshot
 
-def save_snapshot(snapshot, filename):
+class _SortedLookup:
+    # Looks paths up in a sorted (path, entry) stream, for keys that are themselves queried in sorted order.
+    def __init__(self, entries):
+        self._entries = iter(entries)
+        self._current = next(self._entries, None)
+
+    def get(self, path):
+        key = snapshot_sort_key(path)
+        while self._current is not None and snapshot_sort_key(self._current[0]) < key:
+            self._current = next(self._entries, None)
+        if self._current is not None and self._current[0] == path:
+            return self._current[1]
+        return None
+
+def iter_generate_snapshot(folder_path, cache=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS, previous=None,
+                           verify_unchanged=False, window=SNAPSHOT_WINDOW):
+    """
+    Streaming generate_snapshot: yields (path, entry) in snapshot_sort_key order.
+
+    Files are processed `window` at a time, so memory does not depend on the
+    size of the tree. `previous` is a sorted (path, entry) stream such as
+    iter_snapshot(); it is merge-joined against the walk.
+    """
+    lookup = _SortedLookup(previous or ())
+    processed = reused = 0
+    batch = []
+
+    def flush():
+        entries, batch_reused = _build_entries(batch, lookup.get, cache, hash_workers, verify_unchanged)
+        batch.clear()
+        return sorted(entries.items(), key=lambda item: snapshot_sort_key(item[0])), batch_reused
+
+    for item in _with_stat(iter_folder_sorted(folder_path)):
+        batch.append(item)
+        if len(batch) >= window:
+            entries, batch_reused = flush()
+            processed, reused = processed + len(entries), reused + batch_reused
+            yield from entries
+    entries, batch_reused = flush()
+    processed, reused = processed + len(entries), reused + batch_reused
+    yield from entries
+    if previous is not None:
+        status(f"Reused {reused} unchanged entries, processed {processed - reused} new or modified files.")
+
+def _under_any(path, directories):
+    # True if path is one of `directories` or lies below one of them.
+    while True:
+        if path in directories:
+            return True
+        parent = os.path.dirname(path)
+        if parent == path or not parent:
+            return False
+        path = parent
+
+def refresh_entries(base_entries, changed_paths, cache=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS):
+    """
+    Re-processes only the files affected by `changed_paths` instead of the whole tree.
+
+    A changed directory stands for every file below it, both those in the
+    base snapshot and those on disk now. Nothing else is read or embedded.
+
+    Args:
+        base_entries: Sorted (path, entry) stream of the snapshot being updated, e.g. iter_snapshot().
+        changed_paths: Files and directories reported as changed.
+
+    Returns:
+        tuple: ({path: new entry, or None if it is gone}, {path: base entry} for the affected paths)
+    """
+    changed = set(changed_paths)
+    old_entries = {path: entry for path, entry in base_entries if _under_any(path, changed)}
+    candidates = set(old_entries)
+    for path in changed:
+        if os.path.isdir(path):
+            candidates.update(iter_folder_sorted(path))
+        elif os.path.isfile(path):
+            candidates.add(path)
+
+    existing = sorted((path for path in candidates if os.path.isfile(path)), key=snapshot_sort_key)
+    entries, _ = _build_entries(_with_stat(existing), lambda path: None, cache, hash_workers, False)
+    return {path: entries.get(path) for path in candidates}, old_entries
+
+def merge_snapshot_updates(base_entries, updates):
+    """
+    Yields the sorted base stream with `updates` applied ({path: entry}, None removes the path),
+    ready for write_snapshot.
+    """
+    pending = sorted(((path, entry) for path, entry in updates.items() if entry is not None),
+                     key=lambda item: snapshot_sort_key(item[0]))
+    i = 0
+    for path, entry in base_entries:
+        key = snapshot_sort_key(path)
+        while i < len(pending) and snapshot_sort_key(pending[i][0]) < key:
+            yield pending[i]
+            i += 1
+        if path in updates:
+            continue  # replaced by, or removed in favour of, the pending entry
+        yield path, entry
+    yield from pending[i:]
+
+def save_snapshot(snapshot, filename, dtype=np.float32):
+    """
+    Saves a snapshot to SNAPSHOT_DIR.
+
+    Names ending in .snap are written in the binary format (see
+    SnapshotWriter); .txt names use the legacy text format.
+
+    Args:
+        snapshot (dict): {path: {"mode": "AI"|"HASH", "value": ...}}
+        filename (str): Snapshot name inside SNAPSHOT_DIR.
+        dtype: Embedding storage type for binary snapshots (np.float32, np.float16 or np.int8).
+
+    Returns:
+        str: Path of the saved snapshot.
+    """
     path = os.path.join(SNAPSHOT_DIR, filename)
+    if filename.endswith(SNAPSHOT_EXT):
+        with SnapshotWriter(path, dtype) as writer:
+            for filepath in sorted(snapshot, key=snapshot_sort_key):
+                writer.add(filepath, snapshot[filepath])
+        return path
     with open(path, 'w') as f:
         for filepath, entry in snapshot.items():
             if entry["mode"] == "AI":
@@ -130,72 +357,503 @@ def save_snapshot(snapshot, filename):
                 f.write(f"{filepath}::HASH::{entry['value']}\n")
     return path
 
+def _raw_to_npy(raw_path, npy_path, dtype, shape):
+    with open(npy_path, "wb") as out:
+        np.lib.format.write_array_header_1_0(out, {
+            "descr": np.lib.format.dtype_to_descr(np.dtype(dtype)),
+            "fortran_order": False,
+            "shape": shape,
+        })
+        with open(raw_path, "rb") as raw:
+            shutil.copyfileobj(raw, out, 1024 * 1024)
+    os.remove(raw_path)
+
+def _swap_snapshot_dir(tmp_path, path):
+    # Existing readers keep their memory maps: the old files stay alive until they are unmapped.
+    old_path = path + ".old"
+    if os.path.exists(path):
+        shutil.rmtree(old_path, ignore_errors=True)
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+class SnapshotWriter:
+    """
+    Streams (path, entry) pairs into a binary snapshot directory:
+
+        manifest.json         format version, embedding dtype and entry count
+        paths.jsonl           one JSON-encoded path per line, in snapshot_sort_key order
+        dims.npy              (N,) int32, embedding length per path (0 = HASH entry)
+        rows.npy              (N,) int64, row of the path in embeddings_<dim>.npy (-1 = HASH entry)
+        digests.npy           (N,) S64, hex digest per path (empty for AI entries)
+        stats.npy             (N x 3) int64, (size, mtime_ns, inode) when stable, else -1
+        partials.npy          (N,) S64, head/tail digest per path (empty if unknown)
+        embeddings_<dim>.npy  (rows x dim) contiguous embedding block per embedding length
+        scales_<dim>.npy      (rows,) float32, per-vector scale of an int8 block (int8 snapshots only)
+
+    Columns are appended to raw files as entries arrive and wrapped into .npy
+    files on close, so memory stays constant. int8 embeddings are encoded
+    with quantize.quantize (one scale per vector) and decoded again on read.
+    The directory is built next to
+    `path` and swapped in with a rename, so a reader never sees a half-written
+    snapshot; leaving the `with` block on an exception discards it.
+    """
+
+    COLUMNS = {"dims": np.int32, "rows": np.int64, "digests": "S64", "stats": np.int64, "partials": "S64"}
+
+    def __init__(self, path, dtype=np.float32):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self._tmp_path = path + ".tmp"
+        self._last_key = None
+        shutil.rmtree(self._tmp_path, ignore_errors=True)
+        os.makedirs(self._tmp_path)
+        self._paths = open(os.path.join(self._tmp_path, "paths.jsonl"), "w", encoding="utf-8")
+        self._columns = {name: open(os.path.join(self._tmp_path, f"{name}.raw"), "wb") for name in self.COLUMNS}
+        self._blocks = {}  # dim -> [raw file, rows written, scales raw file or None]
+
+    def add(self, filepath, entry):
+        key = snapshot_sort_key(filepath)
+        if self._last_key is not None and key <= self._last_key:
+            raise ValueError(f"Snapshot entries must be added in sorted path order: {filepath}")
+        self._last_key = key
+
+        dim, row, digest = 0, -1, b""
+        if entry["mode"] == "AI":
+            vector, scale = quantize.quantize(np.asarray(entry["value"]).reshape(-1), self.dtype.name)
+            dim = len(vector)
+            if dim not in self._blocks:
+                scales = (open(os.path.join(self._tmp_path, f"scales_{dim}.raw"), "wb")
+                          if self.dtype == np.int8 else None)
+                self._blocks[dim] = [open(os.path.join(self._tmp_path, f"embeddings_{dim}.raw"), "wb"), 0, scales]
+            block = self._blocks[dim]
+            block[0].write(vector.tobytes())
+            if block[2] is not None:
+                block[2].write(scale.tobytes())
+            row, block[1] = block[1], block[1] + 1
+        else:
+            digest = entry["value"].encode("ascii")
+
+        stat = entry.get("stat")
+        self._paths.write(json.dumps(filepath) + "\n")
+        self._columns["dims"].write(np.int32(dim).tobytes())
+        self._columns["rows"].write(np.int64(row).tobytes())
+        self._columns["digests"].write(np.array(digest, dtype="S64").tobytes())
+        self._columns["stats"].write(np.array(stat if stat is not None else (-1, -1, -1), dtype=np.int64).tobytes())
+        self._columns["partials"].write(np.array((entry.get("partial") or "").encode("ascii"), dtype="S64").tobytes())
+        self.count += 1
+
+    def _close_files(self):
+        self._paths.close()
+        for f in self._columns.values():
+            f.close()
+        for f, _, scales in self._blocks.values():
+            f.close()
+            if scales is not None:
+                scales.close()
+
+    def close(self):
+        self._close_files()
+        for name, dtype in self.COLUMNS.items():
+            shape = (self.count, 3) if name == "stats" else (self.count,)
+            _raw_to_npy(os.path.join(self._tmp_path, f"{name}.raw"), os.path.join(self._tmp_path, f"{name}.npy"),
+                        dtype, shape)
+        for dim, (_, rows, scales) in self._blocks.items():
+            _raw_to_npy(os.path.join(self._tmp_path, f"embeddings_{dim}.raw"),
+                        os.path.join(self._tmp_path, f"embeddings_{dim}.npy"), self.dtype, (rows, dim))
+            if scales is not None:
+                _raw_to_npy(os.path.join(self._tmp_path, f"scales_{dim}.raw"),
+                            os.path.join(self._tmp_path, f"scales_{dim}.npy"), np.float32, (rows,))
+        with open(os.path.join(self._tmp_path, "manifest.json"), "w") as f:
+            json.dump({"version": SNAPSHOT_FORMAT_VERSION, "dtype": self.dtype.name, "count": self.count}, f)
+        _swap_snapshot_dir(self._tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+            shutil.rmtree(self._tmp_path, ignore_errors=True)
+
+def write_snapshot(entries, filename, dtype=np.float32):
+    """
+    Writes a sorted (path, entry) stream, e.g. from iter_generate_snapshot, to SNAPSHOT_DIR.
+
+    Returns:
+        str: Path of the saved snapshot.
+    """
+    path = os.path.join(SNAPSHOT_DIR, filename)
+    with SnapshotWriter(path, dtype) as writer:
+        for filepath, entry in entries:
+            writer.add(filepath, entry)
+    return path
+
+def replace_snapshot(src_filename, dst_filename):
+    """Renames a binary snapshot in SNAPSHOT_DIR over another one."""
+    _swap_snapshot_dir(os.path.join(SNAPSHOT_DIR, src_filename), os.path.join(SNAPSHOT_DIR, dst_filename))
+
 def load_snapshot(filename):
+    """
+    Loads a snapshot from SNAPSHOT_DIR, in the binary or the legacy text format.
+
+    Binary snapshots are memory-mapped: AI values are float32/float16 row
+    views into the embedding blocks (int8 rows are decoded to float32 one
+    at a time), so no per-element Python floats are built.
+
+    Returns:
+        dict: {path: {"mode": "AI"|"HASH", "value": ...}}, or None if it does not exist.
+    """
     path = os.path.join(SNAPSHOT_DIR, filename)
     if not os.path.exists(path):
         return None
+    if os.path.isdir(path):
+        return dict(_iter_binary_snapshot(path))
     snapshot = {}
     with open(path, 'r') as f:
         for line in f:
             if "::AI::" in line:
                 filepath, vec_str = line.strip().split("::AI::")
-                vector = list(map(float, vec_str.split(",")))
+                vector = np.array(vec_str.split(","), dtype=np.float32)
                 snapshot[filepath] = {"mode": "AI", "value": vector}
             elif "::HASH::" in line:
                 filepath, hashval = line.strip().split("::HASH::")
                 snapshot[filepath] = {"mode": "HASH", "value": hashval}
     return snapshot
 
-def compare_snapshots(prev, current, threshold=0.999999):
+def iter_snapshot(filename):
+    """
+    Yields (path, entry) from a snapshot in SNAPSHOT_DIR in snapshot_sort_key order.
+
+    Current binary snapshots are streamed from their memory maps. Legacy
+    snapshots (text, or binary version 1) are not stored sorted and are
+    loaded into memory first. Yields nothing if the snapshot does not exist.
+    """
+    path = os.path.join(SNAPSHOT_DIR, filename)
+    if os.path.isdir(path) and os.path.exists(os.path.join(path, "paths.jsonl")):
+        yield from _iter_binary_snapshot(path)
+        return
+    snapshot = load_snapshot(filename) or {}
+    for filepath in sorted(snapshot, key=snapshot_sort_key):
+        yield filepath, snapshot[filepath]
+
+def _iter_binary_snapshot(path, chunk_size=65536):
+    with open(os.path.join(path, "manifest.json"), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") not in (1, 2, SNAPSHOT_FORMAT_VERSION):
+        raise ValueError(f"Unsupported snapshot format version {manifest.get('version')} in {path}")
+    columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in SnapshotWriter.COLUMNS}
+    blocks = {
+        int(name[len("embeddings_"):-len(".npy")]): np.load(os.path.join(path, name), mmap_mode="r")
+        for name in os.listdir(path) if name.startswith("embeddings_") and name.endswith(".npy")
+    }
+    scales = {dim: np.load(os.path.join(path, f"scales_{dim}.npy"), mmap_mode="r")
+              for dim in blocks if manifest.get("dtype") == "int8"}
+
+    if manifest["version"] == 1:
+        paths_file = None
+        paths = iter(manifest["paths"])
+    else:
+        paths_file = open(os.path.join(path, "paths.jsonl"), "r", encoding="utf-8")
+        paths = (json.loads(line) for line in paths_file)
+    try:
+        # Columns are converted a chunk at a time: fast, but never the whole snapshot at once.
+        for start in range(0, len(columns["dims"]), chunk_size):
+            chunk = {name: column[start:start + chunk_size].tolist() for name, column in columns.items()}
+            # `paths` goes last so zip stops on the chunk without consuming the next path.
+            for dim, row, digest, stat, partial, filepath in zip(chunk["dims"], chunk["rows"], chunk["digests"],
+                                                                 chunk["stats"], chunk["partials"], paths):
+                if dim in scales:
+                    entry = {"mode": "AI", "value": quantize.dequantize(blocks[dim][row], scales[dim][row]),
+                             "dtype": "int8"}
+                elif dim:
+                    entry = {"mode": "AI", "value": blocks[dim][row], "dtype": manifest.get("dtype", "float32")}
+                else:
+                    entry = {"mode": "HASH", "value": digest.decode("ascii")}
+                entry["stat"] = tuple(stat) if stat[0] >= 0 else None
+                entry["partial"] = partial.decode("ascii") or None
+                yield filepath, entry
+    finally:
+        if paths_file is not None:
+            paths_file.close()
+
+def _comparable_values(entry, prev_entry):
+    """
+    Returns both embeddings as stored at the coarser of their two dtypes.
+
+    Entries read from a float16 or int8 snapshot carry "dtype"; others are
+    float32. Re-encoding the finer side the way SnapshotWriter would makes
+    an unchanged file identical on both sides, so a float32 vs int8 diff
+    does not report quantization error as a modification.
+    """
+    current, prev = entry["value"], prev_entry["value"]
+    dtypes = (entry.get("dtype", "float32"), prev_entry.get("dtype", "float32"))
+    coarse = max(dtypes, key=quantize.EMBEDDING_DTYPES.index)
+    if dtypes[0] != coarse:
+        current = quantize.dequantize(*quantize.quantize(np.asarray(current).reshape(-1), coarse))
+    if dtypes[1] != coarse:
+        prev = quantize.dequantize(*quantize.quantize(np.asarray(prev).reshape(-1), coarse))
+    return current, prev
+
+def _digest_key(entry):
+    # Content identity that survives a rename: SHA-256 for HASH entries, size + head/tail digest for AI ones.
+    # The AI key misses edits in the middle of a file, so _match_renames also compares the embeddings.
+    if entry["mode"] == "HASH":
+        return ("HASH", entry["value"])
+    if entry.get("partial") and entry.get("stat"):
+        return ("AI", entry["partial"], entry["stat"][0], np.shape(entry["value"]))
+    return None
+
+def _match_renames(prev, current, deleted_paths, new_paths):
+    """
+    Pairs NEW paths with DELETED ones: first on identical digests, then on
+    the nearest embedding of the same dimension.
+
+    AI entries matched on their digest key (size and head/tail digest only)
+    still have their embeddings compared, so a same-size edit in the middle
+    of a moved file shows up as a similarity below 1.
+
+    Returns:
+        dict: {new path: (old path, similarity, or None when content is known identical)}
+    """
+    renames = {}
+    old_by_key = {}
+    for old_path in deleted_paths:
+        key = _digest_key(prev[old_path])
+        if key is not None:
+            old_by_key.setdefault(key, []).append(old_path)
+
+    unmatched_new = []
+    for new_path in new_paths:
+        key = _digest_key(current[new_path])
+        candidates = old_by_key.get(key) if key is not None else None
+        if not candidates:
+            unmatched_new.append(new_path)
+            continue
+        # Prefer a candidate with the same file name (a move), else take any.
+        name = os.path.basename(new_path)
+        pick = next((i for i, old_path in enumerate(candidates) if os.path.basename(old_path) == name), 0)
+        old_path = candidates.pop(pick)
+        sim = None
+        if key[0] == "AI":
+            new_value, old_value = _comparable_values(current[new_path], prev[old_path])
+            if not np.array_equal(new_value, old_value):
+                sim = simengine.cosine(new_value, old_value)
+        renames[new_path] = (old_path, sim)
+
+    matched_old = {old_path for old_path, _ in renames.values()}
+    new_by_dim, old_by_dim = {}, {}
+    for new_path in unmatched_new:
+        if current[new_path]["mode"] == "AI":
+            new_by_dim.setdefault(np.shape(current[new_path]["value"]), []).append(new_path)
+    for old_path in deleted_paths:
+        if old_path not in matched_old and prev[old_path]["mode"] == "AI":
+            old_by_dim.setdefault(np.shape(prev[old_path]["value"]), []).append(old_path)
+
+    for dim, new_group in new_by_dim.items():
+        old_group = old_by_dim.get(dim)
+        if not old_group:
+            continue
+        rows, cols, sims = simengine.similar_pairs(
+            simengine.l2_normalize(np.stack([current[path]["value"] for path in new_group])),
+            RENAME_MIN_SIMILARITY,
+            other=simengine.l2_normalize(np.stack([prev[path]["value"] for path in old_group]))
+        )
+        # Greedy one-to-one assignment, most similar pairs first.
+        used_new, used_old = set(), set()
+        for k in np.argsort(-sims, kind="stable"):
+            row, col = int(rows[k]), int(cols[k])
+            if row in used_new or col in used_old:
+                continue
+            used_new.add(row)
+            used_old.add(col)
+            renames[new_group[row]] = (old_group[col], float(sims[k]))
+    return renames
+
+def _rename_message(old_path, new_path, sim, threshold):
+    kind = "MOVED" if os.path.dirname(old_path) != os.path.dirname(new_path) else "RENAMED"
+    msg = f"{kind} (from {old_path})"
+    if sim is not None and sim < threshold:
+        msg += f" + MODIFIED (Similarity: {sim:.6f})"
+    return msg
+
+def rename_source(message):
+    """Returns the old path named by a RENAMED/MOVED diff message, or None for any other message."""
+    match = re.fullmatch(r"(?:RENAMED|MOVED) \(from (.*?)\)(?: \+ MODIFIED \(Similarity: [^)]*\))?", message)
+    return match.group(1) if match else None
+
+def _score_same_path(pending, threshold):
+    # pending: {embedding shape: [(path, current vector, previous vector)]}
     changed = []
-    for path, entry in current.items():
-        if path not in prev:
-            changed.append((path, "NEW"))
-        elif entry["mode"] == "HASH" or prev[path]["mode"] == "HASH":
-            if entry["value"] != prev[path]["value"]:
-                changed.append((path, "MODIFIED (hash only - unsupported)"))
-        else:
-            sim = cosine_similarity([entry["value"]], [prev[path]["value"]])[0][0]
-            if sim < threshold:
-                changed.append((path, f"MODIFIED (Similarity: {sim:.6f})"))
+    for items in pending.values():
+        sims = simengine.rowwise_similarity(
+            np.stack([current for _, current, _ in items]),
+            np.stack([prev for _, _, prev in items])
+        )
+        for i in np.flatnonzero(sims < threshold):
+            changed.append((items[i][0], f"MODIFIED (Similarity: {sims[i]:.6f})"))
+    pending.clear()
     return changed
 
-def load_latest_snapshot(before_filename=None):
+def iter_snapshot_diff(prev_entries, current_entries, threshold=UNCHANGED_SIMILARITY, detect_renames=True,
+                       window=SNAPSHOT_WINDOW):
+    """
+    Merge-joins two sorted (path, entry) streams and yields (path, message) changes.
+
+    Same-path embeddings are buffered `window` at a time and scored per
+    dimension in one vectorized call, so memory is bounded by the window,
+    not by the size of the snapshots. Paths only in the previous stream are
+    DELETED and paths only in the current one are NEW, unless detect_renames
+    pairs them up as RENAMED/MOVED: first on identical digests, then on the
+    nearest embedding with similarity >= RENAME_MIN_SIMILARITY. Rename
+    detection has to hold the unmatched entries until the end, so its memory
+    grows with the number of NEW and DELETED files only.
+
+    Byte-identical embeddings are never scored, and thresholds above
+    UNCHANGED_SIMILARITY are lowered to it, so rounding in the cosine cannot
+    report an unchanged file as MODIFIED. Snapshots stored at different
+    dtypes are compared at the coarser one (see _comparable_values).
+    """
+    threshold = min(threshold, UNCHANGED_SIMILARITY)
+    prev_entries, current_entries = iter(prev_entries), iter(current_entries)
+    prev_item, current_item = next(prev_entries, None), next(current_entries, None)
+    pending, pending_count = {}, 0
+    new_entries, deleted_entries = {}, {}
+
+    while prev_item is not None or current_item is not None:
+        if current_item is None or (prev_item is not None and
+                                    snapshot_sort_key(prev_item[0]) < snapshot_sort_key(current_item[0])):
+            path, entry = prev_item
+            if detect_renames:
+                deleted_entries[path] = entry
+            else:
+                yield (path, "DELETED")
+            prev_item = next(prev_entries, None)
+            continue
+        if prev_item is None or snapshot_sort_key(current_item[0]) < snapshot_sort_key(prev_item[0]):
+            path, entry = current_item
+            if detect_renames:
+                new_entries[path] = entry
+            else:
+                yield (path, "NEW")
+            current_item = next(current_entries, None)
+            continue
+
+        path, entry = current_item
+        prev_entry = prev_item[1]
+        if entry["mode"] == "HASH" or prev_entry["mode"] == "HASH":
+            if entry["value"] != prev_entry["value"]:
+                yield (path, "MODIFIED (hash only - unsupported)")
+        elif np.shape(entry["value"]) != np.shape(prev_entry["value"]):
+            yield (path, "MODIFIED (embedding shape changed)")
+        else:
+            value, prev_value = _comparable_values(entry, prev_entry)
+            if not np.array_equal(value, prev_value):
+                pending.setdefault(np.shape(value), []).append((path, value, prev_value))
+                pending_count += 1
+                if pending_count >= window:
+                    yield from _score_same_path(pending, threshold)
+                    pending_count = 0
+        prev_item, current_item = next(prev_entries, None), next(current_entries, None)
+    yield from _score_same_path(pending, threshold)
+
+    if not detect_renames:
+        return
+    renames = _match_renames(deleted_entries, new_entries, list(deleted_entries), list(new_entries))
+    for path in new_entries:
+        if path in renames:
+            old_path, sim = renames[path]
+            yield (path, _rename_message(old_path, path, sim, threshold))
+        else:
+            yield (path, "NEW")
+    renamed_from = {old_path for old_path, _ in renames.values()}
+    for path in deleted_entries:
+        if path not in renamed_from:
+            yield (path, "DELETED")
+
+def compare_snapshots(prev, current, threshold=UNCHANGED_SIMILARITY, detect_renames=True):
+    """
+    Diffs two in-memory snapshots (see iter_snapshot_diff).
+
+    Returns:
+        list[tuple]: (path, message) per change; renames are reported on the new path.
+    """
+    def in_order(snapshot):
+        return ((path, snapshot[path]) for path in sorted(snapshot, key=snapshot_sort_key))
+
+    return list(iter_snapshot_diff(in_order(prev), in_order(current), threshold, detect_renames,
+                                   window=max(len(current), 1)))
+
+def write_snapshot_diff(prev_entries, current_entries, report_path, threshold=UNCHANGED_SIMILARITY,
+                        detect_renames=True):
+    """
+    Streams iter_snapshot_diff into a diff report, one `path ==> message` line per change.
+
+    Returns:
+        int: Number of changes written.
+    """
+    count = 0
+    with open(report_path, "w") as f:
+        for path, msg in iter_snapshot_diff(prev_entries, current_entries, threshold, detect_renames):
+            f.write(f"{path} ==> {msg}\n")
+            count += 1
+    return count
+
+def find_latest_snapshot(before_filename=None):
+    """Returns the name of the newest snapshot of the same folder taken before `before_filename`, or None."""
     if not before_filename:
-        return None, None
+        return None
     current_time = extract_timestamp_from_name(before_filename)
     current_prefix = "_".join(before_filename.split("_")[:-2])
     snapshots = []
     for f in os.listdir(SNAPSHOT_DIR):
-        if not f.endswith(".txt") or not f.startswith(current_prefix):
+        if not f.endswith(SNAPSHOT_EXTENSIONS) or not f.startswith(current_prefix):
             continue
         file_time = extract_timestamp_from_name(f)
         if file_time and file_time < current_time:
             snapshots.append((file_time, f))
     if not snapshots:
-        return None, None
+        return None
     snapshots.sort()
-    latest_name = snapshots[-1][1]
+    return snapshots[-1][1]
+
+def load_latest_snapshot(before_filename=None):
+    latest_name = find_latest_snapshot(before_filename)
+    if latest_name is None:
+        return None, None
     return latest_name, load_snapshot(latest_name)
 
-def main(folder):
+def main(folder, use_cache=True, verify_cache=False, hash_workers=utilhash.DEFAULT_HASH_WORKERS, dtype=np.float32,
+         incremental=True, verify_unchanged=False):
+    # Both snapshots are streamed in path order, so memory does not grow with the folder.
     snapshot_filename = generate_snapshot_filename(folder)
-    snapshot = generate_snapshot(folder)
-    snapshot_path = save_snapshot(snapshot, snapshot_filename)
+    prev_name = find_latest_snapshot(before_filename=snapshot_filename)
+    cache = digestcache.DigestCache(verify=verify_cache) if use_cache else None
+    try:
+        previous = iter_snapshot(prev_name) if incremental and prev_name else None
+        snapshot_path = write_snapshot(
+            iter_generate_snapshot(folder, cache, hash_workers, previous, verify_unchanged),
+            snapshot_filename, dtype
+        )
+    finally:
+        if cache is not None:
+            for path, algorithm, cached, actual in cache.mismatches:
+                warning(f"Digest cache mismatch on {path} ({algorithm}): cached {cached}, now {actual}")
+            cache.close()
     info(f"Snapshot saved: {snapshot_path}")
 
-    prev_name, prev_snapshot = load_latest_snapshot(before_filename=snapshot_filename)
-    if prev_snapshot:
+    if prev_name:
         info(f"Comparing with previous snapshot: {prev_name}")
-        changes = compare_snapshots(prev_snapshot, snapshot)
+        diff_name = f"diff_{os.path.splitext(snapshot_filename)[0]}_vs_{os.path.splitext(prev_name)[0]}.txt"
+        report_path = os.path.join(REPORT_DIR, diff_name)
+        changes = write_snapshot_diff(iter_snapshot(prev_name), iter_snapshot(snapshot_filename), report_path)
         if changes:
-            diff_name = f"diff_{snapshot_filename.replace('.txt', '')}_vs_{prev_name.replace('.txt','')}.txt"
-            report_path = os.path.join(REPORT_DIR, diff_name)
-            with open(report_path, "w") as f:
-                for path, msg in changes:
-                    f.write(f"{path} ==> {msg}\n")
-            warning(f"Changes detected: {len(changes)} (saved to {report_path})")
+            warning(f"Changes detected: {changes} (saved to {report_path})")
         else:
+            os.remove(report_path)
             status("No significant changes since last snapshot.")
     else:
         status("No previous snapshot to compare.")
@@ -204,5 +862,17 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--folder", required=True, help="Folder to snapshot")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the persistent digest cache")
+    parser.add_argument("--verify-cache", action="store_true", help="Re-hash every file and flag cache entries that no longer match")
+    parser.add_argument("--hash-workers", type=int, default=utilhash.DEFAULT_HASH_WORKERS, help="Threads used for hashing non-AI files")
+    precision = parser.add_mutually_exclusive_group()
+    precision.add_argument("--float16", action="store_true", help="Store embeddings as float16 (half the size, ~1e-3 relative error)")
+    precision.add_argument("--int8", action="store_true",
+                           help="Store embeddings as int8 with one scale per vector (a quarter of the size, see quantization.py for the error bound)")
+    parser.add_argument("--full", action="store_true", help="Re-embed and re-hash every file instead of reusing unchanged entries")
+    parser.add_argument("--verify-unchanged", action="store_true",
+                        help="Only reuse an entry if the file's head/tail digest also matches the previous snapshot")
     args = parser.parse_args()
-    main(args.folder)
\ No newline at end of file
+    main(args.folder, use_cache=not args.no_cache, verify_cache=args.verify_cache, hash_workers=args.hash_workers,
+         dtype=np.int8 if args.int8 else np.float16 if args.float16 else np.float32, incremental=not args.full,
+         verify_unchanged=args.verify_unchanged)
\ No newline at end of file
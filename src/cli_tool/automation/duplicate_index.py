@@ -0,0 +1,364 @@
+# duplicate_index.py
+# Persistent duplicate index that is updated file by file instead of re-scanning the folder
+
+import os
+import json
+import time
+import numpy as np
+from loader import (scan_duplicates, daily_snapshot, utilhash, digestcache, simengine, phashindex, chunkindex,
+                    clustering, quantize)
+
+INDEX_FORMAT_VERSION = 3  # version 1 had no chunk index, version 2 stored float32 embeddings only
+INDEXED_GROUPS = ("image", "text", "code")  # scan_duplicates.detect_subtype groups; hash files are not compared
+IMAGE_MODELS = scan_duplicates.IMAGE_MODELS
+TEXT_MODEL = scan_duplicates.TEXT_MODEL
+
+
+def status(msg):
+    print(f"[*] {msg}")
+
+def warning(msg):
+    print(f"[!] {msg}")
+
+
+def _pair_key(file1, file2):
+    return (file1, file2) if file1 < file2 else (file2, file1)
+
+
+class DuplicateIndex:
+    """
+    Current duplicate findings of one folder, with everything needed to update them.
+
+    Per file it keeps size, partial digest, SHA-256 (only computed once
+    another file shares size and partial digest), pHash, normalized
+    embeddings encoded as `embedding_dtype` (images are embedded lazily, once they have a pHash
+    neighbour) and, for binaries, content-defined chunk digests. update() re-reads and re-embeds only the files that changed
+    and queries them against what is stored (one pHash index probe and one
+    matrix product per group), so no unchanged file is read again.
+
+    Findings use the same rules and tags as scan_duplicates.scan_folder_for_duplicates.
+    """
+
+    def __init__(self, folder_path, threshold=scan_duplicates.DEFAULT_AI_SIMILARITY_THRESHOLD,
+                 chunk_threshold=scan_duplicates.CHUNK_SHARED_THRESHOLD,
+                 embedding_dtype=scan_duplicates.EMBEDDING_DTYPE):
+        self.folder = folder_path
+        self.threshold = threshold
+        self.chunk_threshold = chunk_threshold
+        self.embedding_dtype = embedding_dtype
+        self.files = {}  # path -> {"group", "binary", "size", "partial", "sha256", "phash", "stat"}
+        # model -> {path: (codes, scale)} rows of a normalized quantize.QuantizedMatrix
+        self.embeddings = {name: {} for name in IMAGE_MODELS + (TEXT_MODEL,)}
+        self.chunks = chunkindex.ChunkIndex()  # binaries only
+        self.pairs = {}  # (file1, file2) with file1 < file2 -> tag
+        self._pairs_of = {}  # path -> set of paths it is paired with
+        self._groups = {name: set() for name in INDEXED_GROUPS}
+        self._by_partial = {}  # (group, size, partial) -> set of paths
+        self._by_digest = {}  # (group, sha256) -> set of paths
+        self._dir_files = {}  # directory -> set of indexed paths directly in it
+
+    def __len__(self):
+        return len(self.files)
+
+    # --- persistence ---
+
+    def save(self, path):
+        """Writes the index to a single .npz file, replacing any previous one atomically."""
+        meta = {
+            "version": INDEX_FORMAT_VERSION,
+            "folder": self.folder,
+            "threshold": self.threshold,
+            "chunk_threshold": self.chunk_threshold,
+            "embedding_dtype": self.embedding_dtype,
+            "files": self.files,
+            "pairs": [[file1, file2, tag] for (file1, file2), tag in self.pairs.items()],
+        }
+        arrays = {"meta": np.array(json.dumps(meta))}
+        for name, vectors in self.embeddings.items():
+            paths = list(vectors)
+            matrix = quantize.QuantizedMatrix.stack([vectors[p] for p in paths], dtype=self.embedding_dtype)
+            arrays[f"{name}_paths"] = np.array(paths, dtype=str)
+            arrays[f"{name}_vectors"] = matrix.codes
+            arrays[f"{name}_scales"] = matrix.scales
+        # Chunk lists are stored flat, one run of (digest, length, count) rows per binary.
+        labels = list(self.chunks.files)
+        rows = [(digest, length, count) for label in labels
+                for digest, (length, count) in self.chunks.files[label][1].items()]
+        arrays["chunk_paths"] = np.array(labels, dtype=str)
+        arrays["chunk_offsets"] = np.cumsum([0] + [len(self.chunks.files[label][1]) for label in labels])
+        # Raw uint8 rows: a fixed-width bytes dtype would drop trailing NUL bytes of a digest.
+        arrays["chunk_digests"] = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.uint8).reshape(
+            -1, chunkindex.CHUNK_DIGEST_SIZE)
+        arrays["chunk_lengths"] = np.array([row[1] for row in rows], dtype=np.int64)
+        arrays["chunk_counts"] = np.array([row[2] for row in rows], dtype=np.int64)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads an index written by save().
+
+        Returns:
+            DuplicateIndex: Or None if the file does not exist or has an unsupported version.
+        """
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") not in (2, INDEX_FORMAT_VERSION):
+                warning(f"Ignoring duplicate index {path} (format version {meta.get('version')})")
+                return None
+            index = cls(meta["folder"], meta["threshold"], meta["chunk_threshold"],
+                        meta.get("embedding_dtype", "float32"))
+            for name in index.embeddings:
+                codes = data[f"{name}_vectors"]
+                scales = data[f"{name}_scales"] if f"{name}_scales" in data else np.ones(len(codes), dtype=np.float32)
+                index.embeddings[name] = dict(zip(data[f"{name}_paths"].tolist(), zip(codes, scales)))
+            offsets = data["chunk_offsets"].tolist()
+            digests = [row.tobytes() for row in data["chunk_digests"]]
+            lengths, counts = data["chunk_lengths"].tolist(), data["chunk_counts"].tolist()
+            for i, label in enumerate(data["chunk_paths"].tolist()):
+                rows = range(offsets[i], offsets[i + 1])
+                index.chunks.add(label, ((lengths[r], digests[r]) for r in rows for _ in range(counts[r])))
+        for filepath, record in meta["files"].items():
+            if record["stat"] is not None:
+                record["stat"] = tuple(record["stat"])
+            index._insert(filepath, record)
+        for file1, file2, tag in meta["pairs"]:
+            index._add_pair(file1, file2, tag)
+        return index
+
+    # --- bookkeeping ---
+
+    def _insert(self, path, record):
+        self.files[path] = record
+        self._groups[record["group"]].add(path)
+        self._by_partial.setdefault((record["group"], record["size"], record["partial"]), set()).add(path)
+        if record["sha256"] is not None:
+            self._by_digest.setdefault((record["group"], record["sha256"]), set()).add(path)
+        self._dir_files.setdefault(os.path.dirname(path), set()).add(path)
+
+    @staticmethod
+    def _discard(table, key, path):
+        members = table.get(key)
+        if members is not None:
+            members.discard(path)
+            if not members:
+                del table[key]
+
+    def _add_pair(self, file1, file2, tag):
+        self.pairs[_pair_key(file1, file2)] = tag
+        self._pairs_of.setdefault(file1, set()).add(file2)
+        self._pairs_of.setdefault(file2, set()).add(file1)
+
+    def _pairs_involving(self, paths):
+        return {key: self.pairs[key] for path in paths
+                for key in (_pair_key(path, other) for other in self._pairs_of.get(path, ()))}
+
+    def _same_content(self, file1, file2):
+        digest1, digest2 = self.files[file1]["sha256"], self.files[file2]["sha256"]
+        return digest1 is not None and digest1 == digest2
+
+    def _indexed_under(self, path):
+        if path in self.files:
+            return {path}
+        prefix = path + os.sep
+        return {
+            indexed
+            for directory, members in self._dir_files.items() if directory == path or directory.startswith(prefix)
+            for indexed in members
+        }
+
+    # --- updates ---
+
+    def remove_files(self, paths):
+        """Drops files from the index together with every finding that involves them."""
+        for path in paths:
+            record = self.files.pop(path, None)
+            if record is None:
+                continue
+            self._groups[record["group"]].discard(path)
+            self._discard(self._by_partial, (record["group"], record["size"], record["partial"]), path)
+            self._discard(self._by_digest, (record["group"], record["sha256"]), path)
+            self._discard(self._dir_files, os.path.dirname(path), path)
+            for vectors in self.embeddings.values():
+                vectors.pop(path, None)
+            self.chunks.remove(path)
+            for other in self._pairs_of.pop(path, ()):
+                self.pairs.pop(_pair_key(path, other), None)
+                self._pairs_of[other].discard(path)
+
+    def _read_records(self, paths):
+        records = {}
+        for path in paths:
+            group = scan_duplicates.detect_subtype(path)
+            if group not in INDEXED_GROUPS:
+                continue
+            try:
+                st = os.stat(path)
+                partial = utilhash.compute_partial_hash(path)
+            except OSError as e:
+                warning(f"Cannot index {path} — {e}")
+                continue
+            # Like snapshots, a file modified within the racy window is not trusted to be unchanged later.
+            recent = time.time_ns() - st.st_mtime_ns < digestcache.RACY_WINDOW_NS
+            records[path] = {"group": group, "size": st.st_size, "partial": partial, "sha256": None, "phash": None,
+                             "binary": scan_duplicates.detect_file_type(path) in scan_duplicates.BINARY_FILE_TYPES,
+                             "stat": None if recent else daily_snapshot.snapshot_stat_key(st)}
+        return records
+
+    def add_files(self, paths, cache=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS):
+        """Indexes files (which must not be indexed yet) and records their findings against the whole index."""
+        records = self._read_records(paths)
+        if not records:
+            return
+
+        images = [path for path, record in records.items() if record["group"] == "image"]
+        if images:
+            hashes, hashed = scan_duplicates.compute_phashes(images)
+            for path, phash, ok in zip(images, hashes.tolist(), hashed):
+                if ok:
+                    records[path]["phash"] = phash
+        texts = [path for path, record in records.items() if record["group"] != "image"]
+        if texts:
+            matrix, valid = scan_duplicates.embed_texts(texts, embedding_dtype=self.embedding_dtype)
+            for i in np.flatnonzero(valid):
+                self.embeddings[TEXT_MODEL][texts[i]] = matrix.row(i)
+
+        binaries = [path for path in texts if records[path]["binary"]] if self.chunk_threshold else []
+        for path in binaries:
+            try:
+                self.chunks.add(path, chunkindex.iter_chunks(path))
+            except OSError as e:
+                warning(f"Chunking failed on {path} — {e}")
+
+        for path, record in records.items():
+            self._insert(path, record)
+        self._match_exact(records, cache, hash_workers)
+        for group in ("text", "code"):
+            self._match_texts([path for path in texts if records[path]["group"] == group], group)
+        self._match_images([path for path in images if records[path]["phash"] is not None])
+        self._match_binaries([path for path in binaries if path in self.chunks])
+
+    def _match_exact(self, new_paths, cache, hash_workers):
+        # Only files sharing size and partial digest with another file are hashed in full.
+        need_digest = set()
+        for path in new_paths:
+            record = self.files[path]
+            same_partial = self._by_partial[(record["group"], record["size"], record["partial"])]
+            if len(same_partial) > 1:
+                need_digest.update(other for other in same_partial if self.files[other]["sha256"] is None)
+        for path, digests in utilhash.hash_files(sorted(need_digest), ("sha256",), cache, hash_workers,
+                                                 on_error=lambda p, e: warning(f"SHA-256 failed on {p} — {e}")):
+            record = self.files[path]
+            record["sha256"] = digests["sha256"]
+            self._by_digest.setdefault((record["group"], record["sha256"]), set()).add(path)
+
+        for path in new_paths:
+            record = self.files[path]
+            for other in self._by_digest.get((record["group"], record["sha256"]), ()):
+                if other != path:
+                    self._add_pair(path, other, "EXACT_DUPLICATE")
+
+    def _match_texts(self, new_paths, group):
+        vectors = self.embeddings[TEXT_MODEL]
+        new_paths = [path for path in new_paths if path in vectors]
+        others = [path for path in self._groups[group] if path in vectors]
+        if not new_paths or not others:
+            return
+        rows, cols, sims = simengine.similar_pairs(quantize.QuantizedMatrix.stack([vectors[p] for p in new_paths]),
+                                                   self.threshold,
+                                                   other=quantize.QuantizedMatrix.stack([vectors[p] for p in others]))
+        for row, col, sim in zip(rows, cols, sims):
+            file1, file2 = new_paths[row], others[col]
+            if file1 != file2 and not self._same_content(file1, file2):
+                self._add_pair(file1, file2, f"NEAR_DUPLICATE (sim={sim:.2f})")
+
+    def _match_images(self, new_paths):
+        if not new_paths:
+            return
+        known = [path for path in self._groups["image"] if self.files[path]["phash"] is not None]
+        index = phashindex.PHashIndex([self.files[p]["phash"] for p in known], known)
+        candidates = set()
+        for path in new_paths:
+            for other, _ in index.query(self.files[path]["phash"], scan_duplicates.PHASH_MAX_DISTANCE):
+                if other != path and not self._same_content(path, other):
+                    candidates.add(_pair_key(path, other))
+        if not candidates:
+            return
+
+        to_embed = sorted({p for pair in candidates for p in pair if p not in self.embeddings[IMAGE_MODELS[0]]})
+        if to_embed:
+            scan_duplicates.keep_embeddings(self.embeddings, IMAGE_MODELS, to_embed,
+                                            scan_duplicates.embed_images(to_embed, self.embedding_dtype))
+
+        for file1, file2 in sorted(candidates):
+            sim = scan_duplicates.embedding_similarity(self.embeddings, file1, file2)
+            if sim is not None and sim >= self.threshold:
+                self._add_pair(file1, file2, f"NEAR_DUPLICATE (sim={sim:.2f})")
+
+    def _match_binaries(self, new_paths):
+        for path in new_paths:
+            for other, ratio, _ in self.chunks.query(path, self.chunk_threshold):
+                if self.files[other]["group"] == self.files[path]["group"] and not self._same_content(path, other):
+                    self._add_pair(path, other, f"PARTIAL_DUPLICATE (shared={ratio:.2f})")
+
+    def update(self, changed_paths, cache=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS):
+        """
+        Brings the index up to date after files changed.
+
+        Args:
+            changed_paths: Files and directories that changed; a directory stands
+                for everything below it. Passing the folder itself re-checks the
+                whole tree, but files whose (size, mtime, inode) did not change are
+                still not read.
+
+        Returns:
+            tuple: (new findings, findings that no longer hold), each a list of (file1, file2, tag).
+        """
+        indexed, on_disk = set(), set()
+        for path in set(changed_paths):
+            indexed.update(self._indexed_under(path))
+            if os.path.isdir(path):
+                on_disk.update(daily_snapshot.iter_folder_sorted(path))
+            elif os.path.isfile(path):
+                on_disk.add(path)
+
+        unchanged = set()
+        for path in indexed & on_disk:
+            try:
+                if self.files[path]["stat"] == daily_snapshot.snapshot_stat_key(os.stat(path)):
+                    unchanged.add(path)
+            except OSError:
+                pass
+        removed, added = indexed - unchanged, on_disk - unchanged
+
+        before = self._pairs_involving(removed)
+        self.remove_files(removed)
+        self.add_files(sorted(added, key=daily_snapshot.snapshot_sort_key), cache, hash_workers)
+        after = self._pairs_involving(added)
+        if removed or added:
+            status(f"Duplicate index: {len(added)} files (re)indexed, {len(removed - added)} removed, "
+                   f"{len(unchanged)} unchanged.")
+
+        def as_findings(pairs, exclude):
+            findings = [(file1, file2, tag) for (file1, file2), tag in pairs.items() if (file1, file2) not in exclude]
+            return sorted(findings, key=lambda x: x[2], reverse=True)
+        return as_findings(after, before), as_findings(before, after)
+
+    def duplicates(self):
+        """Returns every current finding, sorted by tag like scan_folder_for_duplicates."""
+        return sorted(((file1, file2, tag) for (file1, file2), tag in self.pairs.items()),
+                      key=lambda x: x[2], reverse=True)
+
+    def groups(self):
+        """Returns the current findings merged into clusters (see clustering.DuplicateClusters)."""
+        clusters = clustering.DuplicateClusters()
+        # Exact findings first, as in scan_duplicates.cluster_duplicates.
+        for file1, file2, tag in sorted(self.duplicates(), key=lambda x: (x[2] != "EXACT_DUPLICATE", x[0], x[1])):
+            clusters.add_match(file1, file2, tag)
+        return clusters.clusters(
+            lambda file1, file2: scan_duplicates.embedding_similarity(self.embeddings, file1, file2))
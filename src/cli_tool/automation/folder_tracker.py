@@ -4,14 +4,17 @@
 import os
 import time
 import json
-import numpy as np
 from datetime import datetime
-from loader import daily_snapshot, scan_duplicates
+from loader import daily_snapshot, scan_duplicates, fswatch, dupindex
 
 CHECK_INTERVAL = 30  # seconds between checks (can be adjusted)
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 ALERT_LOG = os.path.join(BASE_DIR, "reports", "tracker_alerts.txt")
+BASELINE_NAME = "tracker_baseline" + daily_snapshot.SNAPSHOT_EXT  # kept in daily_snapshot.SNAPSHOT_DIR
+CURRENT_NAME = "tracker_current" + daily_snapshot.SNAPSHOT_EXT
+INDEX_PATH = os.path.join(daily_snapshot.SNAPSHOT_DIR, "tracker_duplicates.npz")
+INDEX_EMBEDDING_DTYPE = "float16"  # half the memory of float32; cosine error stays below 1e-3 (see quantization.py)
 
 
 def status(msg):
@@ -24,72 +27,113 @@ def warning(msg):
     print(f"[!] {msg}")
 
 
+def _load_index(folder_path):
+    # The duplicate index is kept next to the baseline and caught up with anything changed while stopped.
+    index = dupindex.DuplicateIndex.load(INDEX_PATH)
+    settings = (folder_path, scan_duplicates.DEFAULT_AI_SIMILARITY_THRESHOLD, scan_duplicates.CHUNK_SHARED_THRESHOLD,
+                INDEX_EMBEDDING_DTYPE)
+    if index is None or (index.folder, index.threshold, index.chunk_threshold, index.embedding_dtype) != settings:
+        info("No duplicate index for this folder. Building...")
+        index = dupindex.DuplicateIndex(folder_path, *settings[1:])
+    index.update([folder_path])
+    index.save(INDEX_PATH)
+    return index
+
+
+def _report_changes(index, changes, changed_paths, timestamp):
+    warning(f"{timestamp}: Snapshot changed. Updating duplicate index...")
+    new_only, resolved = index.update(changed_paths)
+    index.save(INDEX_PATH)
+
+    with open(ALERT_LOG, "a") as f:
+        f.write(f"\n=== ALERT [{timestamp}] ===\n")
+        f.write("[Snapshot Changes Detected]:\n")
+        for path, change_type in changes:
+            f.write(f"{path} ==> {change_type}\n")
+        if new_only:
+            f.write("[New Duplicate Files Detected]:\n")
+            for f1, f2, tag in new_only:
+                f.write(f"{tag}:\n → {f1}\n → {f2}\n")
+        if resolved:
+            f.write("[Duplicates No Longer Present]:\n")
+            for f1, f2, tag in resolved:
+                f.write(f"{tag}:\n → {f1}\n → {f2}\n")
+    warning(f"ALERT logged ({len(changes)} changes, {len(new_only)} new duplicates).")
+
+
+def _ensure_baseline(folder_path):
+    snapshot_file = os.path.join(daily_snapshot.SNAPSHOT_DIR, BASELINE_NAME)
+    if os.path.exists(snapshot_file):
+        return False
+    info("No previous baseline snapshot found. Generating...")
+    daily_snapshot.write_snapshot(daily_snapshot.iter_generate_snapshot(folder_path), BASELINE_NAME)
+    info("Baseline snapshot saved. Waiting for changes...")
+    return True
+
+
+def _full_check(folder_path):
+    # Regenerates CURRENT_NAME from the whole tree (unchanged files keep their baseline entries).
+    daily_snapshot.write_snapshot(
+        daily_snapshot.iter_generate_snapshot(folder_path, previous=daily_snapshot.iter_snapshot(BASELINE_NAME)),
+        CURRENT_NAME
+    )
+    return list(daily_snapshot.iter_snapshot_diff(
+        daily_snapshot.iter_snapshot(BASELINE_NAME), daily_snapshot.iter_snapshot(CURRENT_NAME),
+        threshold=daily_snapshot.UNCHANGED_SIMILARITY
+    ))
+
+
+def _partial_check(changed_paths):
+    # Re-processes only the changed paths and splices them into the baseline as CURRENT_NAME.
+    updates, old_entries = daily_snapshot.refresh_entries(daily_snapshot.iter_snapshot(BASELINE_NAME), changed_paths)
+    key = daily_snapshot.snapshot_sort_key
+    changes = list(daily_snapshot.iter_snapshot_diff(
+        sorted(old_entries.items(), key=lambda item: key(item[0])),
+        sorted(((path, entry) for path, entry in updates.items() if entry is not None), key=lambda item: key(item[0])),
+        threshold=daily_snapshot.UNCHANGED_SIMILARITY
+    ))
+    daily_snapshot.write_snapshot(
+        daily_snapshot.merge_snapshot_updates(daily_snapshot.iter_snapshot(BASELINE_NAME), updates), CURRENT_NAME
+    )
+    return changes
+
+
+def _changed_paths(changes):
+    # Every path a snapshot diff names, including the old path of each rename or move.
+    paths = []
+    for path, message in changes:
+        paths.append(path)
+        old_path = daily_snapshot.rename_source(message)
+        if old_path is not None:
+            paths.append(old_path)
+    return paths
+
+
 def monitor_folder(folder_path):
     status(f"Tracker started on folder: {folder_path}")
     status(f"Checking every {CHECK_INTERVAL} seconds\n")
 
-    snapshot_file = os.path.join(BASE_DIR, "reports", "tracker_baseline_snapshot.txt")
-
-    if not os.path.exists(snapshot_file):
-        info("No previous baseline snapshot found. Generating...")
-        baseline = daily_snapshot.generate_snapshot(folder_path)
-        daily_snapshot.daily_snapshot.save_snapshot(baseline, "tracker_baseline_snapshot.txt")
-        info("Baseline snapshot saved. Waiting for changes...")
+    baseline_created = _ensure_baseline(folder_path)
+    index = _load_index(folder_path)
+    if baseline_created:
         time.sleep(CHECK_INTERVAL)
 
-    baseline = daily_snapshot.load_snapshot("tracker_baseline_snapshot.txt")
-    for path in baseline:
-        entry = baseline[path]
-        if entry["mode"] == "AI":
-            entry["value"] = np.array(entry["value"])
-
+    # Snapshots stay on disk and are streamed in path order; only the changes are held in memory.
     while True:
         try:
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            current_snapshot = daily_snapshot.generate_snapshot(folder_path)
-            for path in current_snapshot:
-                entry = current_snapshot[path]
-                if entry["mode"] == "AI":
-                    entry["value"] = np.array(entry["value"])
-
-            changes = daily_snapshot.compare_snapshots(baseline, current_snapshot, threshold=1.0)
+            changes = _full_check(folder_path)
 
             if not changes:
                 status(f"{timestamp}: No snapshot changes.")
+                daily_snapshot.replace_snapshot(CURRENT_NAME, BASELINE_NAME)  # keeps newly stable stat entries
                 time.sleep(CHECK_INTERVAL)
                 continue
 
-            warning(f"{timestamp}: Snapshot changed. Re-scanning duplicates...")
-            new_duplicates = scan_duplicates.scan_folder_for_duplicates(folder_path)
-
-            # Build set of baseline duplicate file paths
-            old_dup_paths = set()
-            baseline_dups = []  # load from previous alert log if needed
-
-            # Detect newly duplicated files only
-            new_only = []
-            for f1, f2, tag in new_duplicates:
-                if f1 not in old_dup_paths or f2 not in old_dup_paths:
-                    new_only.append((f1, f2, tag))
-
-            if changes or new_only:
-                with open(ALERT_LOG, "a") as f:
-                    f.write(f"\n=== ALERT [{timestamp}] ===\n")
-                    if changes:
-                        f.write("[Snapshot Changes Detected]:\n")
-                        for path, change_type in changes:
-                            f.write(f"{path} ==> {change_type}\n")
-                    if new_only:
-                        f.write("[New Duplicate Files Detected]:\n")
-                        for f1, f2, tag in new_only:
-                            f.write(f"{tag}:\n → {f1}\n → {f2}\n")
-                warning(f"ALERT logged ({len(changes)} changes, {len(new_only)} new duplicates).")
-            else:
-                status(f"{timestamp}: Snapshot changed but no new duplicates.")
+            _report_changes(index, changes, _changed_paths(changes), timestamp)
 
             # Update baseline snapshot file
-            save_snapshot(current_snapshot, "tracker_baseline_snapshot.txt")
-            baseline = current_snapshot
+            daily_snapshot.replace_snapshot(CURRENT_NAME, BASELINE_NAME)
 
         except Exception as e:
             warning(f"Error during monitoring: {e}")
@@ -97,6 +141,46 @@ def monitor_folder(folder_path):
         time.sleep(CHECK_INTERVAL)
 
 
+def monitor_folder_events(folder_path):
+    """
+    Event-driven monitor_folder: waits for inotify events instead of re-snapshotting
+    every CHECK_INTERVAL seconds, and re-processes only the paths that changed.
+
+    Bursts of events are coalesced (see fswatch.DEBOUNCE_SECONDS). Directories
+    that cannot get an inotify watch, or the whole tree off Linux, are polled
+    with stat only every CHECK_INTERVAL seconds. If events were lost the whole
+    tree is re-checked as in polling mode.
+    """
+    status(f"Tracker started on folder: {folder_path} (event mode)")
+    _ensure_baseline(folder_path)
+    index = _load_index(folder_path)
+
+    with fswatch.TreeWatcher(folder_path, poll_interval=CHECK_INTERVAL) as watcher:
+        if watcher.uses_inotify:
+            status("Watching for file system events...\n")
+        while True:
+            batch = watcher.wait()
+            try:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                if batch.rescan:
+                    warning(f"{timestamp}: File system events were lost. Re-checking the whole folder...")
+                    changes = _full_check(folder_path)
+                    changed_paths = [folder_path]
+                else:
+                    status(f"{timestamp}: {len(batch)} changed path(s) reported.")
+                    changes = _partial_check(batch.paths)
+                    changed_paths = batch.paths
+
+                if changes:
+                    _report_changes(index, changes, changed_paths, timestamp)
+                else:
+                    status(f"{timestamp}: No snapshot changes.")
+                daily_snapshot.replace_snapshot(CURRENT_NAME, BASELINE_NAME)
+
+            except Exception as e:
+                warning(f"Error during monitoring: {e}")
+
+
 # CLI entry point
 if __name__ == "__main__":
     import argparse
@@ -104,10 +188,15 @@ if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("--folder", required=True, help="Target folder to monitor continuously")
+    parser.add_argument("--events", action="store_true",
+                        help="React to file system events (inotify) instead of re-snapshotting on a timer")
     args = parser.parse_args()
 
     try:
         info("Press ESC to stop the tracker.")
-        monitor_folder(args.folder)
+        if args.events:
+            monitor_folder_events(args.folder)
+        else:
+            monitor_folder(args.folder)
     except KeyboardInterrupt:
         print("\n[!] Tracker stopped by user.")
\ No newline at end of file
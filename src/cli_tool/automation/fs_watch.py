@@ -0,0 +1,299 @@
+# fs_watch.py
+# Recursive change watching: inotify on Linux, stat-only polling for whatever inotify cannot cover
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+EVENT_HEADER = struct.Struct("iIII")  # wd, mask, cookie, len; followed by a NUL-padded name
+READ_SIZE = 64 * 1024
+
+DEBOUNCE_SECONDS = 1.0  # a burst ends after this long without events
+MAX_COALESCE_SECONDS = 10.0  # a burst is cut off after this long even if events keep coming
+POLL_INTERVAL = 30  # seconds between stat passes over directories without an inotify watch
+
+
+def status(msg):
+    print(f"[*] {msg}")
+
+def warning(msg):
+    print(f"[!] {msg}")
+
+
+def _load_inotify():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        functions = (libc.inotify_init1, libc.inotify_add_watch, libc.inotify_rm_watch)
+    except (OSError, AttributeError):
+        return None
+    functions[0].argtypes = [ctypes.c_int]
+    functions[1].argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    functions[2].argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+class ChangeBatch:
+    """
+    Paths that changed during one coalesced burst.
+
+    `paths` holds files and directories (created, modified, deleted or moved);
+    a directory stands for everything that was or is below it. `rescan` is set
+    when events were lost, in which case the whole tree has to be re-checked.
+    """
+
+    def __init__(self):
+        self.paths = set()
+        self.rescan = False
+
+    def __bool__(self):
+        return self.rescan or bool(self.paths)
+
+    def __len__(self):
+        return len(self.paths)
+
+
+class TreeWatcher:
+    """
+    Watches a directory tree and reports what changed, a burst at a time.
+
+    Every directory gets an inotify watch while the kernel allows it. Once
+    watches run out (ENOSPC, see fs.inotify.max_user_watches), or when
+    inotify is unavailable, the remaining directories are polled every
+    `poll_interval` seconds by comparing (size, mtime, inode) of their
+    entries — no file is read to find out what changed.
+    """
+
+    def __init__(self, root, poll_interval=POLL_INTERVAL, debounce=DEBOUNCE_SECONDS, max_coalesce=MAX_COALESCE_SECONDS):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.max_coalesce = max_coalesce
+        self._watches = {}  # wd -> directory
+        self._watched_dirs = {}  # directory -> wd
+        self._polled = {}  # directory -> {name: (is_dir, size, mtime_ns, inode)}
+        self._next_poll = time.monotonic() + poll_interval
+        self._libc = _load_inotify()
+        self._fd = -1
+        if self._libc is not None:
+            self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+            if self._fd < 0:
+                warning(f"inotify unavailable ({os.strerror(ctypes.get_errno())}); polling instead.")
+        if self._fd < 0:
+            status(f"Polling {root} every {poll_interval} seconds (stat only).")
+        self._add_tree(root)
+        if self._fd >= 0 and self._polled:
+            warning(f"Out of inotify watches: polling {len(self._polled)} directories every {poll_interval} seconds.")
+
+    @property
+    def uses_inotify(self):
+        return self._fd >= 0
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+        self._watched_dirs.clear()
+        self._polled.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- watch bookkeeping ---
+
+    def _add_tree(self, directory):
+        """Watches (or polls) directory and every directory below it."""
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            if not self._add_dir(current):
+                continue
+            try:
+                with os.scandir(current) as it:
+                    pending.extend(entry.path for entry in it if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+
+    def _add_dir(self, directory):
+        if directory in self._watched_dirs or directory in self._polled:
+            return False
+        if self._fd >= 0:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = directory
+                self._watched_dirs[directory] = wd
+                return True
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return False
+            if err != errno.ENOSPC:
+                warning(f"Cannot watch {directory} — {os.strerror(err)}")
+        listing = self._list(directory)
+        if listing is None:
+            return False
+        self._polled[directory] = listing
+        return True
+
+    def _drop_tree(self, directory):
+        """Forgets directory and everything below it (it was deleted or moved away)."""
+        prefix = directory + os.sep
+        for path in [p for p in self._watched_dirs if p == directory or p.startswith(prefix)]:
+            wd = self._watched_dirs.pop(path)
+            self._watches.pop(wd, None)
+            if self._fd >= 0:
+                self._libc.inotify_rm_watch(self._fd, wd)  # fails harmlessly if the kernel already dropped it
+        for path in [p for p in self._polled if p == directory or p.startswith(prefix)]:
+            del self._polled[path]
+
+    # --- stat polling ---
+
+    @staticmethod
+    def _list(directory):
+        listing = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    listing[entry.name] = (entry.is_dir(follow_symlinks=False), st.st_size, st.st_mtime_ns, st.st_ino)
+        except OSError:
+            return None
+        return listing
+
+    def _poll(self, batch):
+        for directory, before in list(self._polled.items()):
+            if directory not in self._polled:
+                continue  # dropped while handling an earlier directory
+            after = self._list(directory)
+            if after is None:
+                batch.paths.add(directory)
+                self._drop_tree(directory)
+                continue
+            self._polled[directory] = after
+            for name in before.keys() | after.keys():
+                old, new = before.get(name), after.get(name)
+                if old == new:
+                    continue
+                path = os.path.join(directory, name)
+                if old is not None and old[0] and (new is None or not new[0]):
+                    self._drop_tree(path)
+                if new is not None and new[0]:
+                    if old is None or not old[0]:
+                        self._add_tree(path)
+                    else:
+                        continue  # a directory's own metadata changed; its entries are checked separately
+                batch.paths.add(path)
+
+    # --- inotify ---
+
+    def _read_events(self, batch):
+        try:
+            data = os.read(self._fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                batch.rescan = True
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                self._watches.pop(wd, None)
+                if self._watched_dirs.get(directory) == wd:
+                    del self._watched_dirs[directory]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                if directory == self.root:
+                    batch.rescan = True  # the watched folder itself went away or was renamed
+                continue  # children report their own removal through the parent's watch
+
+            path = os.path.join(directory, name) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_DELETE | IN_MOVED_FROM):
+                    self._drop_tree(path)
+                elif mask & (IN_CREATE | IN_MOVED_TO):
+                    self._add_tree(path)  # files created before the watch existed are covered by `path` itself
+                else:
+                    continue
+            batch.paths.add(path)
+
+    def _wait_readable(self, timeout):
+        if self._fd < 0:
+            if timeout is not None:
+                time.sleep(timeout)
+            return False
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        return bool(readable)
+
+    def wait(self, timeout=None):
+        """
+        Blocks until something changes, then keeps collecting until the burst is over.
+
+        Args:
+            timeout (float): Give up after this many seconds (None waits forever).
+
+        Returns:
+            ChangeBatch: Empty if the timeout expired first.
+        """
+        batch = ChangeBatch()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not batch:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return batch
+            wake = [self._next_poll] if self._polled or self._fd < 0 else []
+            if deadline is not None:
+                wake.append(deadline)
+            if self._wait_readable(max(0.0, min(wake) - now) if wake else None):
+                self._read_events(batch)
+            if time.monotonic() >= self._next_poll:
+                self._poll(batch)
+                self._next_poll = time.monotonic() + self.poll_interval
+
+        if self._fd >= 0:
+            burst_end = time.monotonic() + self.max_coalesce
+            while not batch.rescan:
+                remaining = burst_end - time.monotonic()
+                if remaining <= 0 or not self._wait_readable(min(self.debounce, remaining)):
+                    break
+                self._read_events(batch)
+        return batch
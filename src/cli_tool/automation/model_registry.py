@@ -0,0 +1,127 @@
+# model_registry.py
+# Shared, lazily loaded AI models with least-recently-used eviction under a RAM budget
+
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+import loader
+
+# 0 disables eviction. Can also be changed at runtime with set_ram_budget().
+MODEL_RAM_BUDGET_MB = int(os.environ.get("DUPLIHQ_MODEL_RAM_MB", "0"))
+
+
+def _with_transform(module):
+    return module.load_model(), module.get_transform()
+
+
+# name -> (loader module name, function returning what callers unpack)
+MODEL_SPECS = {
+    "clip": ("clip_model", lambda m: m.load_model()),  # (model, preprocess)
+    "dinov2": ("dinov2_model", _with_transform),  # (model, transform)
+    "resnet18": ("resnet18_model", _with_transform),
+    "resnet50": ("resnet50_model", _with_transform),
+    "resnet101": ("resnet101_model", _with_transform),
+    "efficientnet_b1": ("efficientnet_b1_model", _with_transform),
+    "efficientnet_b3": ("efficientnet_b3_model", _with_transform),
+    "sbert": ("sbert_model", lambda m: m.load_model()),  # model
+    "sbert_deep": ("sbert_deep_model", lambda m: m.load_model()),  # model
+    "codebert": ("codebert_model", lambda m: m.load_model()),  # (tokenizer, model)
+}
+
+_models = OrderedDict()  # name -> (loaded value, estimated bytes), least recently used first
+_lock = threading.RLock()
+_budget_bytes = MODEL_RAM_BUDGET_MB * 1024 * 1024
+
+
+def status(msg):
+    print(f"[*] {msg}")
+
+
+def get_module(name):
+    """Returns the ai_model wrapper module that implements `name`."""
+    if name not in MODEL_SPECS:
+        raise KeyError(f"Unknown model '{name}'. Known models: {', '.join(MODEL_SPECS)}")
+    return getattr(loader, MODEL_SPECS[name][0])
+
+
+def estimate_size(value):
+    """
+    Estimates the RAM held by a loaded model from its torch parameters and buffers.
+
+    Args:
+        value: A model, or a tuple containing models (tokenizers and transforms count as 0).
+
+    Returns:
+        int: Size in bytes.
+    """
+    parts = value if isinstance(value, tuple) else (value,)
+    total = 0
+    for part in parts:
+        if hasattr(part, "parameters") and hasattr(part, "buffers"):
+            for tensor in list(part.parameters()) + list(part.buffers()):
+                total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def get_model(name):
+    """
+    Returns the shared instance of a model, loading it on first use.
+
+    Args:
+        name (str): Key of MODEL_SPECS, e.g. "clip" or "codebert".
+
+    Returns:
+        Whatever the wrapper provides: (model, transform) for vision models,
+        (tokenizer, model) for CodeBERT, the model itself for SBERT.
+    """
+    with _lock:
+        if name in _models:
+            _models.move_to_end(name)
+            return _models[name][0]
+
+        module = get_module(name)
+        value = MODEL_SPECS[name][1](module)
+        _models[name] = (value, estimate_size(value))
+        _enforce_budget(keep=name)
+        return value
+
+
+def _enforce_budget(keep=None):
+    if not _budget_bytes:
+        return
+    evicted = False
+    while sum(size for _, size in _models.values()) > _budget_bytes:
+        victim = next((name for name in _models if name != keep), None)
+        if victim is None:
+            break
+        status(f"Evicting model '{victim}' to stay within {_budget_bytes // (1024 * 1024)} MB")
+        del _models[victim]
+        evicted = True
+    if evicted:
+        gc.collect()
+
+
+def set_ram_budget(megabytes):
+    """Sets the RAM budget for loaded models in MB (0 = unlimited) and evicts if needed."""
+    global _budget_bytes
+    with _lock:
+        _budget_bytes = int(megabytes) * 1024 * 1024
+        _enforce_budget()
+
+
+def loaded_models():
+    """Returns {name: estimated MB} for the models currently in memory, least recently used first."""
+    with _lock:
+        return {name: size / (1024 * 1024) for name, (_, size) in _models.items()}
+
+
+def evict(name=None):
+    """Drops one model, or every model when no name is given."""
+    with _lock:
+        if name is None:
+            _models.clear()
+        else:
+            _models.pop(name, None)
+    gc.collect()
@@ -2,7 +2,6 @@ import os
 import numpy as np
 import json
 from itertools import combinations
-from sklearn.metrics.pairwise import cosine_similarity
 from datetime import datetime
 from tqdm import tqdm
 
@@ -20,6 +19,16 @@ from loader import (
     codebert_model,
     pcphash,
     utilhash,
+    digestcache,
+    simengine,
+    annindex,
+    clustering,
+    phashindex,
+    chunkindex,
+    minhashlsh,
+    quantize,
+    textcache,
+    model_registry,
     daily_snapshot
 )
 
@@ -48,156 +57,689 @@ def detect_subtype(file_path):
 
 PHASH_LENGTH = 64
 PHASH_SIMILARITY_THRESHOLD = 0.40
-PHASH_MAX_DISTANCE = int((1 - PHASH_SIMILARITY_THRESHOLD) * PHASH_LENGTH)
+PHASH_MAX_DISTANCE = int((1 - PHASH_SIMILARITY_THRESHOLD) * PHASH_LENGTH)  # 38 bits: too wide for band probing
 DEFAULT_AI_SIMILARITY_THRESHOLD = 0.75
-
-dinov2 = dinov2_model.load_model()
-dinov2_transform = dinov2_model.get_transform()
-resnet50 = resnet50_model.load_model()
-resnet50_transform = resnet50_model.get_transform()
-sbert = sbert_deep_model.load_model()
-tokenizer, codebert = codebert_model.load_model()
+ANN_MIN_FILES = 20000  # below this many embeddings the exact tiled search is used
+ANN_N_PROBE = annindex.DEFAULT_N_PROBE
+IMAGE_BATCH_SIZE = 16  # images per forward pass when embedding
+WATCHLIST_MAX_DISTANCE = 8  # pHash bits that may differ from a watchlist entry
+MINHASH_MIN_FILES = 2000  # text/code groups from this size on only embed MinHash/LSH candidate pairs
+MINHASH_JACCARD_THRESHOLD = minhashlsh.DEFAULT_JACCARD_THRESHOLD
+CHUNK_SHARED_THRESHOLD = 0.5  # share of the smaller binary's bytes that must be in common chunks
+BINARY_FILE_TYPES = ("binary", "unknown")  # detect_file_type results compared by content-defined chunks
+EMBEDDING_DTYPE = quantize.DEFAULT_EMBEDDING_DTYPE  # storage of embeddings during a scan: float32, float16 or int8
+IMAGE_MODELS = ("dinov2", "resnet50")  # order of embed_images
+TEXT_MODEL = "text"  # SBERT + CodeBERT concatenation from embed_texts
 
 def compute_sha256(file_path):
     return utilhash.compute_sha256(file_path)
 
-def scan_folder_for_duplicates(folder_path, threshold=DEFAULT_AI_SIMILARITY_THRESHOLD):
+def _bucket_by(file_paths, key_func, label):
+    buckets = {}
+    for path in file_paths:
+        try:
+            key = key_func(path)
+        except OSError as e:
+            warning(f"{label} failed on {path} — {e}")
+            continue
+        buckets.setdefault(key, []).append(path)
+    return [paths for paths in buckets.values() if len(paths) > 1]
+
+def find_exact_duplicates(file_paths, cache=None, workers=utilhash.DEFAULT_HASH_WORKERS):
+    """
+    Groups byte-identical files in three stages: size, partial digest, full SHA-256.
+
+    Files with a unique size are never read, and only files that still collide
+    after the head/tail digest are hashed in full (or looked up in `cache`),
+    on `workers` threads.
+
+    Returns:
+        list[list[str]]: Groups of two or more files with identical content.
+    """
+    candidates = [
+        same_partial
+        for same_size in _bucket_by(file_paths, os.path.getsize, "stat")
+        for same_partial in _bucket_by(same_size, utilhash.compute_partial_hash, "Partial hash")
+    ]
+    digests = {
+        path: result["sha256"]
+        for path, result in utilhash.hash_files(
+            (path for group in candidates for path in group), ("sha256",), cache, workers,
+            on_error=lambda path, e: warning(f"SHA-256 failed on {path} — {e}")
+        )
+    }
+
+    groups = []
+    for same_partial in candidates:
+        groups.extend(_bucket_by([path for path in same_partial if path in digests], digests.get, "SHA-256"))
+    return groups
+
+def stack_features(vectors, dtype=EMBEDDING_DTYPE):
+    """
+    Normalizes and encodes per-file vectors into one matrix as they arrive.
+
+    Args:
+        vectors (iterable): One numpy vector (or None for a failed file) per file.
+        dtype (str): "float32", "float16" or "int8" (see quantize.QuantizedMatrix).
+
+    Returns:
+        tuple: (matrix, valid) where matrix is an (N x D) normalized
+        quantize.QuantizedMatrix and valid marks the rows that hold a real embedding.
+    """
+    rows, dim = [], None
+    for vec in vectors:
+        if isinstance(vec, np.ndarray) and vec.ndim == 1 and dim in (None, vec.shape[0]):
+            dim = vec.shape[0]
+            rows.append(quantize.QuantizedMatrix.from_float(vec[None, :], dtype).row(0))
+        else:
+            rows.append(None)
+    valid = np.array([row is not None for row in rows], dtype=bool)
+    return quantize.QuantizedMatrix.stack(rows, dim or 0, dtype), valid
+
+def _extract_or_none(extract, file_path):
+    try:
+        return extract(file_path)
+    except Exception as e:
+        warning(f"Feature extraction failed on {file_path} — {e}")
+        return None
+
+def embed_images(file_paths, embedding_dtype=EMBEDDING_DTYPE):
+    """
+    Embeds each image once with DINOv2 and ResNet-50 using batched inference.
+
+    Returns:
+        list[tuple]: One (matrix, valid) pair per model.
+    """
+    feature_sets = []
+    for name, module in zip(IMAGE_MODELS, (dinov2_model, resnet50_model)):
+        model, transform = model_registry.get_model(name)
+        status(f"Embedding {len(file_paths)} images ({name}, batch size {IMAGE_BATCH_SIZE})")
+        vectors = module.extract_features_batch(
+            file_paths, model, transform, batch_size=IMAGE_BATCH_SIZE,
+            on_error=lambda path, e: warning(f"Feature extraction failed on {path} — {e}")
+        )
+        feature_sets.append(stack_features(vectors, embedding_dtype))
+    return feature_sets
+
+def _embed_text_file(file_path, texts):
+    if texts.file_type(file_path) != "text":
+        warning(f"Skipping non-text file misclassified as text: {file_path}")
+        return None
+
+    content = texts.get(file_path)
+    if content is not None and len(content.strip()) < 4:
+        warning(f"Skipping tiny file: {file_path}")
+        return None
+
+    sbert = model_registry.get_model("sbert_deep")
+    tokenizer, codebert = model_registry.get_model("codebert")
+    if content is None:
+        # Too large to hold in memory: both encoders stream it from disk.
+        vec_a = sbert_deep_model.extract_features_from_file(file_path, sbert)
+        vec_b = codebert_model.extract_features_from_file(file_path, tokenizer, codebert)
+    else:
+        vec_a = sbert_deep_model.extract_features_from_text(content, sbert)
+        vec_b = codebert_model.extract_features_from_text(content, tokenizer, codebert)
+    if not isinstance(vec_a, np.ndarray) or not isinstance(vec_b, np.ndarray):
+        return None
+
+    vec = np.concatenate([vec_a, vec_b])
+    if np.std(vec) < 1e-6:
+        warning(f"Skipping low-variance file: {file_path}")
+        return None
+    return vec
+
+def embed_texts(file_paths, texts=None, embedding_dtype=EMBEDDING_DTYPE):
+    """
+    Embeds each text/code file once as concatenated SBERT + CodeBERT vectors; returns (matrix, valid).
+
+    Files are read through `texts` (a TextCache shared with the other stages
+    of the scan), so both encoders get the same decoded buffer. Each vector
+    is encoded as soon as it is computed, so only the `embedding_dtype`
+    matrix grows with the number of files.
+    """
+    texts = texts if texts is not None else textcache.TextCache()
+    return stack_features((
+        _extract_or_none(lambda path: _embed_text_file(path, texts), path)
+        for path in tqdm(file_paths, desc="Embedding text/code")
+    ), embedding_dtype)
+
+def keep_embeddings(embeddings, names, file_paths, feature_sets):
+    """
+    Copies the valid rows of each (matrix, valid) feature set into embeddings[name][path].
+
+    Does nothing when embeddings is None.
+    """
+    if embeddings is None:
+        return
+    for name, (matrix, valid) in zip(names, feature_sets):
+        vectors = embeddings.setdefault(name, {})
+        for i in np.flatnonzero(valid):
+            vectors[file_paths[i]] = matrix.row(i)
+
+def embedding_similarity(embeddings, file1, file2):
+    """
+    Best cosine similarity of two files over the models that embedded both.
+
+    Args:
+        embeddings (dict): model -> {path: (codes, scale)} rows of normalized
+            matrices, as filled by keep_embeddings or held by DuplicateIndex.
+
+    Returns:
+        float: Or None if no model embedded both files.
+    """
+    sims = [float(np.dot(quantize.dequantize(*vectors[file1], normalize=True),
+                         quantize.dequantize(*vectors[file2], normalize=True)))
+            for vectors in embeddings.values() if file1 in vectors and file2 in vectors]
+    return min(max(sims), 1.0) if sims else None
+
+def _same_exact_group(exact_group_of, file1, file2):
+    return file1 in exact_group_of and exact_group_of[file1] == exact_group_of.get(file2)
+
+def find_similar_pairs(matrix, valid, threshold, ann_probe=ANN_N_PROBE):
+    """
+    Finds all pairs of valid rows whose cosine similarity is at least `threshold`.
+
+    Small sets use the exact tiled engine. From ANN_MIN_FILES rows on, an IVF
+    index proposes candidates (probing `ann_probe` lists) and each candidate is
+    re-scored exactly before the threshold check; ann_probe=0 forces exact search.
+
+    Args:
+        matrix (quantize.QuantizedMatrix): Normalized embeddings from stack_features.
+
+    Returns:
+        tuple: (rows, cols, sims) numpy arrays indexing the rows of `matrix`.
+    """
+    embedded = np.flatnonzero(valid)
+    normed = matrix.take(embedded)
+    if ann_probe and len(embedded) >= ANN_MIN_FILES:
+        status(f"Using ANN candidate search over {len(embedded)} embeddings (n_probe={ann_probe})")
+        rows, cols, sims = annindex.IVFIndex(n_probe=ann_probe).build(normed).similar_pairs(threshold)
+    else:
+        rows, cols, sims = simengine.similar_pairs(normed, threshold)
+    return embedded[rows], embedded[cols], sims
+
+def compute_phashes(file_paths, workers=pcphash.DEFAULT_PHASH_WORKERS):
+    """
+    Computes the packed pHash of every image once, on a process pool.
+
+    Returns:
+        tuple: (hashes, hashed) where hashes is an (N,) uint64 array and
+        hashed marks the images that could be decoded.
+    """
+    hashes, errors = pcphash.compute_phash_batch(file_paths, workers)
+    hashed = np.ones(len(file_paths), dtype=bool)
+    for i, msg in sorted(errors.items()):
+        warning(f"phash failed on {file_paths[i]} — {msg}")
+        hashed[i] = False
+    return hashes, hashed
+
+class WatchlistMatch:
+    """
+    A scanned image within a few pHash bits of a watchlist entry.
+
+    Kept apart from the (file1, file2, tag) duplicate findings: `label` is a
+    watchlist label, not a path, so reports store it under its own key.
+    """
+
+    def __init__(self, file, label, distance):
+        self.file = file
+        self.label = label
+        self.distance = distance
+
+    @property
+    def tag(self):
+        return f"WATCHLIST_MATCH (dist={self.distance})"
+
+    def to_dict(self):
+        return {"file": self.file, "watchlist_label": self.label, "distance": self.distance,
+                "match_type": "WATCHLIST_MATCH"}
+
+    def __repr__(self):
+        return f"WatchlistMatch({self.file!r}, {self.label!r}, {self.distance})"
+
+def match_watchlist(group_files, hashes, hashed, watchlist, radius=WATCHLIST_MAX_DISTANCE):
+    """
+    Looks up every hashed image in a watchlist PHashIndex.
+
+    Returns:
+        list[WatchlistMatch]: One per match within `radius` bits.
+    """
+    matches = []
+    for i in np.flatnonzero(hashed):
+        for label, dist in watchlist.query(hashes[i], radius):
+            warning(f"Watchlist match: {group_files[i]} ~ {label} (distance={dist})")
+            matches.append(WatchlistMatch(group_files[i], label, int(dist)))
+    return matches
+
+def scan_image_group(group_files, exact_group_of, threshold, ann_probe=ANN_N_PROBE, watchlist=None,
+                     embedding_dtype=EMBEDDING_DTYPE, embeddings=None):
+    """
+    Finds near-duplicate images: pHash gate plus the best of DINOv2 / ResNet-50 cosine.
+
+    Small groups find pHash neighbours with a PHashIndex radius join and embed only those.
+    At PHASH_MAX_DISTANCE the join is the tiled XOR/popcount all-pairs scan, not
+    band probing; the multi-index only speeds up tight radii such as watchlist lookups.
+    Large groups embed every image and let find_similar_pairs propose pairs,
+    which then go through the same pHash gate.
+    Every embedded image is kept in `embeddings` (see keep_embeddings).
+    """
+    hashes, hashed = compute_phashes(group_files)
+    if watchlist is not None:
+        yield from match_watchlist(group_files, hashes, hashed, watchlist)
+
+    # Files outside any exact group get a unique negative id so they never compare equal.
+    exact_ids = np.array([exact_group_of.get(path, -1 - i) for i, path in enumerate(group_files)], dtype=np.int64)
+
+    def passes_gates(rows, cols):
+        keep = hashed[rows] & hashed[cols] & (exact_ids[rows] != exact_ids[cols])
+        keep &= pcphash.popcount64(hashes[rows] ^ hashes[cols]) <= PHASH_MAX_DISTANCE
+        return rows[keep], cols[keep]
+
+    if ann_probe and len(group_files) >= ANN_MIN_FILES:
+        files = np.flatnonzero(hashed)
+        feature_sets = embed_images([group_files[i] for i in files], embedding_dtype)
+        proposed = set()
+        for matrix, valid in feature_sets:
+            rows, cols, _ = find_similar_pairs(matrix, valid, threshold, ann_probe)
+            proposed.update(zip(rows.tolist(), cols.tolist()))
+        proposed = np.array(sorted(proposed), dtype=np.intp).reshape(-1, 2)
+        rows, cols = passes_gates(files[proposed[:, 0]], files[proposed[:, 1]])
+    else:
+        positions = np.flatnonzero(hashed)
+        index = phashindex.PHashIndex(hashes[positions])
+        rows, cols, _ = index.radius_pairs(PHASH_MAX_DISTANCE)
+        rows, cols = passes_gates(positions[rows], positions[cols])
+        # Embed every candidate image exactly once.
+        files = np.unique(np.concatenate([rows, cols]))
+        feature_sets = embed_images([group_files[i] for i in files], embedding_dtype) if len(files) else []
+    keep_embeddings(embeddings, IMAGE_MODELS, [group_files[i] for i in files], feature_sets)
+    if not len(rows):
+        return
+
+    # Map group indices to feature rows, then score all pairs per model in one call.
+    feature_rows = np.searchsorted(files, rows)
+    feature_cols = np.searchsorted(files, cols)
+    best = np.full(len(rows), -np.inf, dtype=np.float32)
+    for matrix, valid in feature_sets:
+        sims = simengine.pair_similarities(matrix, feature_rows, feature_cols)
+        sims[~(valid[feature_rows] & valid[feature_cols])] = -np.inf
+        best = np.maximum(best, sims)
+
+    for row, col, best_sim in zip(rows, cols, best):
+        if best_sim == -np.inf:
+            continue
+        file1, file2 = group_files[row], group_files[col]
+        if best_sim >= threshold:
+            info(f"Near-duplicate image detected (sim={best_sim:.2f})")
+            yield (file1, file2, f"NEAR_DUPLICATE (sim={best_sim:.2f})")
+        else:
+            status(f"Image sim={best_sim:.2f} < threshold. Ignored.")
+
+def _minhash_file(file_path, texts):
+    if texts.file_type(file_path) != "text":
+        return None
+    content = texts.get(file_path)
+    if content is None:
+        with open(file_path, 'rb') as f:
+            content = f.read(textcache.MAX_CACHED_FILE_MB * 1024 * 1024).decode('utf-8', errors='ignore')
+    return minhashlsh.compute_minhash(content)
+
+def minhash_candidates(group_files, exact_group_of, jaccard_threshold=MINHASH_JACCARD_THRESHOLD, texts=None):
+    """
+    Proposes text/code pairs whose estimated shingle Jaccard reaches jaccard_threshold.
+
+    Files over the TextCache per-file cap are signed from their first MAX_CACHED_FILE_MB.
+
+    Returns:
+        tuple: (rows, cols) numpy arrays of positions in group_files, rows < cols.
+    """
+    texts = texts if texts is not None else textcache.TextCache()
+    signatures = [_extract_or_none(lambda path: _minhash_file(path, texts), path)
+                  for path in tqdm(group_files, desc="MinHash text/code")]
+    rows, cols, _ = minhashlsh.candidate_pairs(signatures, jaccard_threshold)
+    keep = np.array([not _same_exact_group(exact_group_of, group_files[r], group_files[c])
+                     for r, c in zip(rows.tolist(), cols.tolist())], dtype=bool)
+    if len(rows):
+        rows, cols = rows[keep], cols[keep]
+    status(f"MinHash/LSH proposed {len(rows)} candidate pairs among {len(group_files)} files")
+    return rows, cols
+
+def scan_text_group(group_files, exact_group_of, threshold, ann_probe=ANN_N_PROBE,
+                    minhash_threshold=MINHASH_JACCARD_THRESHOLD, texts=None, embedding_dtype=EMBEDDING_DTYPE,
+                    embeddings=None):
+    """
+    Finds near-duplicate text/code files from cosine similarity over their embeddings.
+
+    Groups of MINHASH_MIN_FILES or more are first filtered with MinHash/LSH:
+    only files in a pair whose estimated shingle Jaccard reaches
+    minhash_threshold are embedded, and only those pairs are scored.
+    minhash_threshold=0 embeds and compares every file.
+    Every embedded file is kept in `embeddings` (see keep_embeddings).
+    """
+    texts = texts if texts is not None else textcache.TextCache()
+    if minhash_threshold and len(group_files) >= MINHASH_MIN_FILES:
+        rows, cols = minhash_candidates(group_files, exact_group_of, minhash_threshold, texts)
+        files = np.unique(np.concatenate([rows, cols]))
+        if not len(files):
+            return
+        # Embed in reverse MinHash read order: the files MinHash read last are the ones
+        # still in the LRU text cache, so a group larger than the cache still gets hits.
+        files = files[::-1]
+        matrix, valid = embed_texts([group_files[i] for i in files], texts, embedding_dtype)
+        keep_embeddings(embeddings, (TEXT_MODEL,), [group_files[i] for i in files], [(matrix, valid)])
+        feature_rows = len(files) - 1 - np.searchsorted(files[::-1], rows)
+        feature_cols = len(files) - 1 - np.searchsorted(files[::-1], cols)
+        sims = simengine.pair_similarities(matrix, feature_rows, feature_cols)
+        keep = valid[feature_rows] & valid[feature_cols] & (sims >= threshold)
+        rows, cols, sims = rows[keep], cols[keep], sims[keep]
+    else:
+        matrix, valid = embed_texts(group_files, texts, embedding_dtype)
+        keep_embeddings(embeddings, (TEXT_MODEL,), group_files, [(matrix, valid)])
+        rows, cols, sims = find_similar_pairs(matrix, valid, threshold, ann_probe)
+
+    for row, col, sim in zip(rows, cols, sims):
+        file1, file2 = group_files[row], group_files[col]
+        if _same_exact_group(exact_group_of, file1, file2):
+            continue
+        info(f"Near-duplicate text/code detected (sim={sim:.2f})")
+        yield (file1, file2, f"NEAR_DUPLICATE (sim={sim:.2f})")
+
+def scan_binary_group(group_files, exact_group_of, min_shared=CHUNK_SHARED_THRESHOLD):
+    """
+    Finds binaries that share most of their bytes (repacked, appended to, partly overwritten)
+    from a content-defined chunk index: shared ratios come from chunk postings,
+    never from comparing the files byte by byte.
+    """
+    index = chunkindex.ChunkIndex()
+    for path in tqdm(group_files, desc="Chunking binaries"):
+        try:
+            index.add(path, chunkindex.iter_chunks(path))
+        except OSError as e:
+            warning(f"Chunking failed on {path} — {e}")
+
+    for file1, file2, ratio, _ in index.similar_pairs(min_shared):
+        if _same_exact_group(exact_group_of, file1, file2):
+            continue
+        info(f"Partial duplicate binary detected (shared={ratio:.2f})")
+        yield (file1, file2, f"PARTIAL_DUPLICATE (shared={ratio:.2f})")
+
+def report_cache_mismatches(cache):
+    for path, algorithm, cached, actual in cache.mismatches:
+        warning(f"Digest cache mismatch on {path} ({algorithm}): cached {cached}, now {actual}")
+
+def iter_duplicates(folder_path, threshold=DEFAULT_AI_SIMILARITY_THRESHOLD, use_cache=True, verify_cache=False,
+                    ann_probe=ANN_N_PROBE, watchlist_path=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS,
+                    collapse_exact=False, chunk_threshold=CHUNK_SHARED_THRESHOLD,
+                    minhash_threshold=MINHASH_JACCARD_THRESHOLD, embedding_dtype=EMBEDDING_DTYPE, embeddings=None):
+    """
+    Scans a folder and yields (file1, file2, tag) findings as soon as each is confirmed.
+
+    With a watchlist, images matching it are yielded as WatchlistMatch records
+    in the same stream; tell them apart with isinstance.
+
+    Nothing is accumulated, so memory does not grow with the number of
+    findings. Findings arrive per file group, exact duplicates first.
+
+    With collapse_exact, an exact group of N files yields N - 1 findings
+    against its first file instead of every pair, and only that first file
+    takes part in the near-duplicate stages.
+
+    Binaries are also compared by content-defined chunks; chunk_threshold=0 skips that stage.
+    minhash_threshold is the MinHash/LSH bar for large text/code groups (see scan_text_group).
+    embedding_dtype ("float32", "float16" or "int8") is how embeddings are held while they are compared.
+    Given a dict as `embeddings`, every embedding computed is also kept there (see keep_embeddings).
+    """
+    watchlist = phashindex.load_watchlist(watchlist_path) if watchlist_path else None
+    cache = digestcache.DigestCache(verify=verify_cache) if use_cache else None
+    try:
+        yield from _iter_folder(folder_path, threshold, cache, ann_probe, watchlist, hash_workers, collapse_exact,
+                                chunk_threshold, minhash_threshold, embedding_dtype, embeddings)
+    finally:
+        if cache is not None:
+            report_cache_mismatches(cache)
+            cache.close()
+
+def scan_folder_for_duplicates(folder_path, threshold=DEFAULT_AI_SIMILARITY_THRESHOLD, use_cache=True, verify_cache=False,
+                               ann_probe=ANN_N_PROBE, watchlist_path=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS,
+                               chunk_threshold=CHUNK_SHARED_THRESHOLD, minhash_threshold=MINHASH_JACCARD_THRESHOLD,
+                               embedding_dtype=EMBEDDING_DTYPE):
+    """
+    Runs iter_duplicates to completion.
+
+    Returns:
+        tuple: (duplicates, watchlist_matches) where duplicates holds the
+        (file1, file2, tag) findings sorted by tag and watchlist_matches the
+        WatchlistMatch records (empty without a watchlist).
+    """
+    duplicates, watchlist_matches = [], []
+    for finding in iter_duplicates(folder_path, threshold, use_cache, verify_cache, ann_probe, watchlist_path,
+                                   hash_workers, chunk_threshold=chunk_threshold, minhash_threshold=minhash_threshold,
+                                   embedding_dtype=embedding_dtype):
+        (watchlist_matches if isinstance(finding, WatchlistMatch) else duplicates).append(finding)
+    return sorted(duplicates, key=lambda x: x[2], reverse=True), watchlist_matches
+
+def cluster_duplicates(folder_path, threshold=DEFAULT_AI_SIMILARITY_THRESHOLD, use_cache=True, verify_cache=False,
+                       ann_probe=ANN_N_PROBE, watchlist_path=None, hash_workers=utilhash.DEFAULT_HASH_WORKERS,
+                       chunk_threshold=CHUNK_SHARED_THRESHOLD, minhash_threshold=MINHASH_JACCARD_THRESHOLD,
+                       embedding_dtype=EMBEDDING_DTYPE):
+    """
+    Scans a folder and merges the findings into duplicate clusters.
+
+    The embeddings computed during the scan are kept until the end to score
+    every member against its cluster's representative.
+
+    Returns:
+        tuple: (clusters, watchlist_matches) where clusters is the list from
+        DuplicateClusters.clusters() and watchlist_matches holds the
+        WatchlistMatch records.
+    """
+    clusters = clustering.DuplicateClusters()
+    watchlist_matches = []
+    embeddings = {}
+    for finding in iter_duplicates(folder_path, threshold, use_cache, verify_cache, ann_probe, watchlist_path,
+                                   hash_workers, collapse_exact=True, chunk_threshold=chunk_threshold,
+                                   minhash_threshold=minhash_threshold, embedding_dtype=embedding_dtype,
+                                   embeddings=embeddings):
+        if isinstance(finding, WatchlistMatch):
+            watchlist_matches.append(finding)
+        else:
+            clusters.add_match(*finding)
+    return clusters.clusters(lambda file1, file2: embedding_similarity(embeddings, file1, file2)), watchlist_matches
+
+def _iter_folder(folder_path, threshold, cache, ann_probe, watchlist, hash_workers, collapse_exact=False,
+                 chunk_threshold=CHUNK_SHARED_THRESHOLD, minhash_threshold=MINHASH_JACCARD_THRESHOLD,
+                 embedding_dtype=EMBEDDING_DTYPE, embeddings=None):
     type_groups = {"image": [], "text": [], "code": [], "hashfile": []}
+    binaries = set()
+    texts = textcache.TextCache()  # every text file is read and decoded once for the whole scan
 
     for root, _, filenames in os.walk(folder_path):
         for f in filenames:
             full_path = os.path.join(root, f)
-            ftype = detect_file_type(full_path)
+            ftype = texts.file_type(full_path)
             subtype = detect_subtype(full_path)
             if subtype in type_groups:
                 type_groups[subtype].append(full_path)
-
-    duplicates = []
+            if ftype in BINARY_FILE_TYPES:
+                binaries.add(full_path)
 
     for group_name, group_files in type_groups.items():
         if group_name == "hashfile":
             continue
 
-        checked = set()
-        for file1, file2 in tqdm(combinations(group_files, 2), desc=f"Scanning {group_name} pairs"):
-            if (file1, file2) in checked or (file2, file1) in checked:
-                continue
-            checked.add((file1, file2))
-
-            status(f"Comparing: {file1} <-> {file2}")
-
-            hash1 = compute_sha256(file1)
-            hash2 = compute_sha256(file2)
-            if hash1 == hash2:
+        exact_group_of = {}
+        copies = set()
+        for group_id, group in enumerate(find_exact_duplicates(group_files, cache, hash_workers)):
+            pairs = ((group[0], other) for other in group[1:]) if collapse_exact else combinations(group, 2)
+            for file1, file2 in pairs:
                 info(f"Exact duplicate detected:")
                 info(f"→ {file1}")
                 info(f"→ {file2}")
-                duplicates.append((file1, file2, "EXACT_DUPLICATE"))
-                continue
-
-            if group_name == "image":
-                hash1 = pcphash.compute_phash(file1)
-                hash2 = pcphash.compute_phash(file2)
-                if hash1 is None or hash2 is None:
-                    warning(f"phash failed on {file1} or {file2}")
-                    continue
-
-                dist = pcphash.hamming_distance(hash1, hash2)
-                if dist > PHASH_MAX_DISTANCE:
-                    continue
-
-                sim_scores = []
-                vec1_dino = dinov2_model.extract_features(file1, dinov2, dinov2_transform)
-                vec2_dino = dinov2_model.extract_features(file2, dinov2, dinov2_transform)
-                if vec1_dino is not None and vec2_dino is not None and vec1_dino.shape == vec2_dino.shape:
-                    sim_scores.append(cosine_similarity([vec1_dino], [vec2_dino])[0][0])
-
-                vec1_res = resnet50_model.extract_features(file1, resnet50, resnet50_transform)
-                vec2_res = resnet50_model.extract_features(file2, resnet50, resnet50_transform)
-                if vec1_res is not None and vec2_res is not None and vec1_res.shape == vec2_res.shape:
-                    sim_scores.append(cosine_similarity([vec1_res], [vec2_res])[0][0])
-
-                if sim_scores:
-                    best_sim = max(sim_scores)
-                    if best_sim >= threshold:
-                        info(f"Near-duplicate image detected (sim={best_sim:.2f})")
-                        duplicates.append((file1, file2, f"NEAR_DUPLICATE (sim={best_sim:.2f})"))
-                    else:
-                        status(f"Image sim={best_sim:.2f} < threshold. Ignored.")
-
-            elif group_name in ["text", "code"]:
-                if detect_file_type(file1) != "text" or detect_file_type(file2) != "text":
-                    warning(f"Skipping non-text files misclassified as text: {file1}, {file2}")
-                    continue
-
-                try:
-                    with open(file1, 'rb') as f:
-                        content1 = f.read().decode('utf-8', errors='ignore')
-                    with open(file2, 'rb') as f:
-                        content2 = f.read().decode('utf-8', errors='ignore')
-                    if len(content1.strip()) < 4 or len(content2.strip()) < 4:
-                        warning(f"Skipping tiny files: {file1}, {file2}")
-                        continue
-
-                    vec1a = sbert_deep_model.extract_features_from_file(file1, sbert)
-                    vec1b = codebert_model.extract_features_from_file(file1, tokenizer, codebert)
-                    vec2a = sbert_deep_model.extract_features_from_file(file2, sbert)
-                    vec2b = codebert_model.extract_features_from_file(file2, tokenizer, codebert)
-                except Exception as e:
-                    warning(f"Exception: {file1}, {file2} — {e}")
-                    continue
-
-                if any(v is None or not isinstance(v, np.ndarray) for v in [vec1a, vec1b, vec2a, vec2b]):
-                    continue
-
-                v1 = np.concatenate([vec1a, vec1b])
-                v2 = np.concatenate([vec2a, vec2b])
-
-                if np.std(v1) < 1e-6 or np.std(v2) < 1e-6:
-                    warning(f"Skipping low-variance file: {file1} or {file2}")
-                    continue
-                if v1.shape != v2.shape:
-                    continue
-
-                sim = cosine_similarity([v1], [v2])[0][0]
-                if sim >= threshold:
-                    info(f"Near-duplicate text/code detected (sim={sim:.2f})")
-                    duplicates.append((file1, file2, f"NEAR_DUPLICATE (sim={sim:.2f})"))
-                else:
-                    status(f"Text/code sim={sim:.2f} < threshold. Ignored.")
-
-    return sorted(duplicates, key=lambda x: x[2], reverse=True)
-
-def save_report(duplicates):
+                yield (file1, file2, "EXACT_DUPLICATE")
+            for path in group:
+                exact_group_of[path] = group_id
+            copies.update(group[1:])
+
+        if collapse_exact:
+            # Copies share their embeddings and pHash, so only the first of each exact group is compared.
+            group_files = [path for path in group_files if path not in copies]
+
+        if group_name == "image":
+            yield from scan_image_group(group_files, exact_group_of, threshold, ann_probe, watchlist, embedding_dtype,
+                                        embeddings)
+        else:
+            yield from scan_text_group(group_files, exact_group_of, threshold, ann_probe, minhash_threshold, texts,
+                                       embedding_dtype, embeddings)
+            group_binaries = [path for path in group_files if path in binaries]
+            if chunk_threshold and len(group_binaries) > 1:
+                yield from scan_binary_group(group_binaries, exact_group_of, chunk_threshold)
+
+    if texts.hits or texts.misses:
+        status(f"Text cache: {texts.misses} file reads, {texts.hits} repeated reads avoided")
+
+def save_report(duplicates, clusters=None, watchlist_matches=None):
+    """
+    Saves findings to a timestamped JSON report in SCAN_DIR.
+
+    The report is a list of pair entries. With clusters or watchlist matches
+    it becomes an object: {"clusters" or "duplicates": [...], "watchlist_matches": [...]}.
+
+    Args:
+        duplicates (list[tuple]): (file1, file2, tag) findings; ignored in cluster mode.
+        clusters (list[dict]): Clusters from cluster_duplicates; when given, the
+            report holds one entry per cluster instead of one per pair.
+        watchlist_matches (list[WatchlistMatch]): Watchlist hits, stored as
+            {"file", "watchlist_label", "distance", "match_type"} entries.
+    """
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    report_path = os.path.join(SCAN_DIR, f"duplicates_{timestamp}.json")
+    kind = "duplicates" if clusters is None else "clusters"
+    report_path = os.path.join(SCAN_DIR, f"{kind}_{timestamp}.json")
     status(f"Saving report to: {report_path}")
 
     report_data = [
         {"file1": f1, "file2": f2, "match_type": tag}
         for f1, f2, tag in duplicates
     ]
+    watchlist_data = [match.to_dict() for match in watchlist_matches or []]
+    if clusters is not None:
+        report_data = {"clusters": clusters, "watchlist_matches": watchlist_data}
+    elif watchlist_data:
+        report_data = {"duplicates": report_data, "watchlist_matches": watchlist_data}
 
     with open(report_path, "w") as f:
         json.dump(report_data, f, indent=2)
 
     info(f"Report saved to: {report_path}")
 
+def stream_report(duplicates, report_path=None):
+    """
+    Writes findings to a JSON Lines report as they arrive and passes them through.
+
+    Every finding is flushed as one line, so the report can be tailed while
+    the scan runs and a crash loses at most the finding being written.
+
+    Args:
+        duplicates (iterable): (file1, file2, tag) findings and WatchlistMatch
+            records, e.g. from iter_duplicates. Watchlist lines use the keys of
+            WatchlistMatch.to_dict instead of file1/file2.
+        report_path (str): Output file; defaults to a timestamped .jsonl in SCAN_DIR.
+
+    Yields:
+        Each finding, after it has been written.
+    """
+    if report_path is None:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        report_path = os.path.join(SCAN_DIR, f"duplicates_{timestamp}.jsonl")
+    status(f"Streaming report to: {report_path}")
+
+    count = 0
+    with open(report_path, "w") as f:
+        for finding in duplicates:
+            if isinstance(finding, WatchlistMatch):
+                record = finding.to_dict()
+            else:
+                record = {"file1": finding[0], "file2": finding[1], "match_type": finding[2]}
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            count += 1
+            yield finding
+
+    info(f"Report saved to: {report_path} ({count} findings)")
+
+def print_watchlist_matches(watchlist_matches):
+    for match in watchlist_matches:
+        print(f"{match.tag}:\n → {match.file}\n ≈ watchlist entry: {match.label}\n")
+
 if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("--folder", required=True, help="Target folder to scan for duplicates")
     parser.add_argument("--threshold", type=float, default=DEFAULT_AI_SIMILARITY_THRESHOLD, help="AI similarity threshold")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the persistent digest cache")
+    parser.add_argument("--verify-cache", action="store_true", help="Re-hash every file and flag cache entries that no longer match")
+    parser.add_argument("--ann-probe", type=int, default=ANN_N_PROBE,
+                        help=f"IVF lists probed per query on groups of {ANN_MIN_FILES}+ files (0 = exact search only)")
+    parser.add_argument("--watchlist", help="File of known pHashes (one per line, optional ',label') to match images against")
+    parser.add_argument("--hash-workers", type=int, default=utilhash.DEFAULT_HASH_WORKERS, help="Threads used for full-file hashing")
+    parser.add_argument("--chunk-threshold", type=float, default=CHUNK_SHARED_THRESHOLD,
+                        help="Share of bytes two binaries must have in common chunks to be reported (0 = skip chunking)")
+    parser.add_argument("--minhash-threshold", type=float, default=MINHASH_JACCARD_THRESHOLD,
+                        help=f"Estimated shingle Jaccard a text/code pair needs to be embedded, on groups of {MINHASH_MIN_FILES}+ files (0 = embed everything)")
+    parser.add_argument("--embedding-dtype", choices=quantize.EMBEDDING_DTYPES, default=EMBEDDING_DTYPE,
+                        help="How embeddings are held while compared: float16 halves memory, int8 quarters it (see quantization.py for the error bounds)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--stream", action="store_true", help="Write findings to a JSONL report as they are found instead of sorting them at the end")
+    output.add_argument("--clusters", action="store_true", help="Merge findings into duplicate clusters, one report entry per cluster")
     args = parser.parse_args()
 
     try:
-        results = scan_folder_for_duplicates(args.folder, args.threshold)
-        if results:
-            info("Potential duplicates found:")
-            for f1, f2, tag in results:
-                print(f"{tag}:\n → {f1}\n → {f2}\n")
-            save_report(results)
+        if args.clusters:
+            clusters, watchlist_matches = cluster_duplicates(args.folder, args.threshold, use_cache=not args.no_cache,
+                                                             verify_cache=args.verify_cache, ann_probe=args.ann_probe,
+                                                             watchlist_path=args.watchlist, hash_workers=args.hash_workers,
+                                                             chunk_threshold=args.chunk_threshold,
+                                                             minhash_threshold=args.minhash_threshold,
+                                                             embedding_dtype=args.embedding_dtype)
+            if clusters or watchlist_matches:
+                info(f"Duplicate clusters found: {len(clusters)}")
+                for cluster in clusters:
+                    print(f"CLUSTER ({cluster['size']} files):\n ★ {cluster['representative']}")
+                    for member in cluster["members"]:
+                        sim = "n/a" if member["similarity"] is None else f"{member['similarity']:.2f}"
+                        print(f" → {member['file']}  [{member['match_type']}, sim to ★ {sim}]")
+                    print()
+                print_watchlist_matches(watchlist_matches)
+                save_report([], clusters, watchlist_matches)
+            else:
+                status("No duplicates found.")
+        elif args.stream:
+            findings = iter_duplicates(args.folder, args.threshold, use_cache=not args.no_cache,
+                                       verify_cache=args.verify_cache, ann_probe=args.ann_probe,
+                                       watchlist_path=args.watchlist, hash_workers=args.hash_workers,
+                                       chunk_threshold=args.chunk_threshold,
+                                       minhash_threshold=args.minhash_threshold,
+                                       embedding_dtype=args.embedding_dtype)
+            for finding in stream_report(findings):
+                if isinstance(finding, WatchlistMatch):
+                    print_watchlist_matches([finding])
+                else:
+                    print(f"{finding[2]}:\n → {finding[0]}\n → {finding[1]}\n")
         else:
-            status("No duplicates found.")
+            results, watchlist_matches = scan_folder_for_duplicates(args.folder, args.threshold,
+                                                              use_cache=not args.no_cache,
+                                                              verify_cache=args.verify_cache, ann_probe=args.ann_probe,
+                                                              watchlist_path=args.watchlist, hash_workers=args.hash_workers,
+                                                              chunk_threshold=args.chunk_threshold,
+                                                              minhash_threshold=args.minhash_threshold,
+                                                              embedding_dtype=args.embedding_dtype)
+            if results or watchlist_matches:
+                info("Potential duplicates found:")
+                for f1, f2, tag in results:
+                    print(f"{tag}:\n → {f1}\n → {f2}\n")
+                print_watchlist_matches(watchlist_matches)
+                save_report(results, watchlist_matches=watchlist_matches)
+            else:
+                status("No duplicates found.")
     except Exception as e:
-        warning(f"Unexpected error: {e}")
\ No newline at end of file
+        warning(f"Unexpected error: {e}")
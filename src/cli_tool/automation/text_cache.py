@@ -0,0 +1,80 @@
+# text_cache.py
+# Read-once text loading for a scan: each file is read and decoded once, then shared by every stage
+
+import os
+import threading
+from collections import OrderedDict
+from loader import daily_snapshot
+
+# 0 disables caching (every get() reads the file again).
+TEXT_CACHE_MB = int(os.environ.get("DUPLIHQ_TEXT_CACHE_MB", "256"))
+MAX_CACHED_FILE_MB = 16  # larger files are not loaded whole; encoders stream them from disk instead
+
+
+class TextCache:
+    """
+    Least-recently-used cache of decoded file contents, capped by total size.
+
+    Files are read in binary and decoded as UTF-8 (invalid bytes dropped) a
+    single time; the MinHash prefilter, the tiny-file check and both text
+    encoders then share the same string. File types from detect_file_type
+    are remembered too, since classifying an extensionless file reads it.
+
+    Once a stage reads more than the cap, a later stage that re-reads the
+    same files in the same order misses on every one of them (each is
+    evicted just before it is needed again). Such stages should go in
+    reverse order, as scan_text_group does after MinHash.
+    """
+
+    def __init__(self, max_mb=TEXT_CACHE_MB, max_file_mb=MAX_CACHED_FILE_MB):
+        self.max_bytes = max_mb * 1024 * 1024
+        self.max_file_bytes = max_file_mb * 1024 * 1024
+        self.hits = 0
+        self.misses = 0
+        self._texts = OrderedDict()  # path -> (text, bytes read), least recently used first
+        self._size = 0
+        self._types = {}
+        self._lock = threading.Lock()
+
+    def file_type(self, file_path):
+        """Returns daily_snapshot.detect_file_type(file_path), computed once per file."""
+        file_type = self._types.get(file_path)
+        if file_type is None:
+            file_type = self._types[file_path] = daily_snapshot.detect_file_type(file_path)
+        return file_type
+
+    def get(self, file_path):
+        """
+        Returns the decoded content of a file.
+
+        Returns:
+            str: Or None if the file is larger than the per-file cap; read it in blocks instead.
+        """
+        with self._lock:
+            entry = self._texts.get(file_path)
+            if entry is not None:
+                self._texts.move_to_end(file_path)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        if os.path.getsize(file_path) > self.max_file_bytes:
+            return None
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        text = raw.decode('utf-8', errors='ignore')
+        if len(raw) <= self.max_bytes:
+            with self._lock:
+                if file_path not in self._texts:
+                    self._texts[file_path] = (text, len(raw))
+                    self._size += len(raw)
+                while self._size > self.max_bytes:
+                    _, (_, size) = self._texts.popitem(last=False)
+                    self._size -= size
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._texts.clear()
+            self._size = 0
+        self._types.clear()
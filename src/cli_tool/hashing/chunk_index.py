@@ -0,0 +1,180 @@
+import hashlib
+import numpy as np
+
+CHUNK_MIN_SIZE = 2 * 1024  # no boundary is accepted closer than this to the previous one
+CHUNK_AVG_BITS = 13  # a boundary is found every 2**13 = 8 KiB on average
+CHUNK_MAX_SIZE = 64 * 1024  # a boundary is forced after this many bytes
+CHUNK_DIGEST_SIZE = 16  # BLAKE2b digest bytes kept per chunk
+CHUNK_READ_SIZE = 4 * 1024 * 1024  # bytes rolled per numpy pass
+MAX_CHUNK_POSTINGS = 1000  # chunks shared by more files than this (zero fill, headers) are not evidence
+GEAR_WINDOW = 32  # bytes that influence a 32-bit gear hash
+
+# Random 32-bit value per byte; fixed seed so boundaries are identical across runs and machines.
+_GEAR = np.random.default_rng(0x6CDC).integers(0, 2**32, 256, dtype=np.uint64).astype(np.uint32)
+# Boundary test on the top bits, which mix in the whole window (the low bits only see the last few bytes).
+_BOUNDARY_MASK = np.uint32(((1 << CHUNK_AVG_BITS) - 1) << (32 - CHUNK_AVG_BITS))
+
+
+def _gear_hashes(data):
+    """
+    Gear rolling hash at every position of `data`: h[i] = sum(GEAR[data[i - k]] << k for k < GEAR_WINDOW), mod 2**32.
+
+    Shifting by one bit per byte pushes bytes older than the window out of a
+    32-bit hash, so every position can be computed independently. The window
+    sum is built by doubling (h_2w[i] = h_w[i] + (h_w[i - w] << w)), which
+    takes log2(GEAR_WINDOW) vectorized passes instead of a byte loop.
+    """
+    hashes = _GEAR[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < GEAR_WINDOW and width < len(hashes):
+        hashes[width:] += np.left_shift(hashes[:-width], width)
+        width *= 2
+    return hashes
+
+
+def iter_chunks(file_path, read_size=CHUNK_READ_SIZE):
+    """
+    Splits a file into content-defined chunks.
+
+    Boundaries are placed where the rolling hash of the preceding bytes hits
+    a fixed pattern, so inserting or deleting bytes only moves the chunks
+    around the edit: the rest of the file still produces the same chunks.
+    Chunks are between CHUNK_MIN_SIZE and CHUNK_MAX_SIZE bytes (except the last).
+
+    Yields:
+        tuple: (length, digest) per chunk, digest being CHUNK_DIGEST_SIZE bytes of BLAKE2b.
+    """
+    history = b""  # last bytes of the previous block, so hashes roll across block edges
+    pending = bytearray()  # bytes of the current, not yet cut chunk
+    chunk_start = 0  # file offset of pending[0]
+    with open(file_path, "rb") as f:
+        while block := f.read(read_size):
+            block_start = chunk_start + len(pending)
+            pending += block
+            hashes = _gear_hashes(history + block)[len(history):]
+            candidates = block_start + np.flatnonzero((hashes & _BOUNDARY_MASK) == 0) + 1
+            history = (history + block)[-(GEAR_WINDOW - 1):]
+
+            cuts = []
+            position = chunk_start
+            for cut in candidates.tolist():
+                while cut - position > CHUNK_MAX_SIZE:
+                    position += CHUNK_MAX_SIZE
+                    cuts.append(position)
+                if cut - position >= CHUNK_MIN_SIZE:
+                    position = cut
+                    cuts.append(position)
+            while block_start + len(block) - position > CHUNK_MAX_SIZE:
+                position += CHUNK_MAX_SIZE
+                cuts.append(position)
+
+            offset = 0
+            view = memoryview(pending)
+            for cut in cuts:
+                length = cut - chunk_start - offset
+                yield length, hashlib.blake2b(view[offset:offset + length], digest_size=CHUNK_DIGEST_SIZE).digest()
+                offset += length
+            view.release()
+            del pending[:offset]
+            chunk_start += offset
+    if pending:
+        yield len(pending), hashlib.blake2b(pending, digest_size=CHUNK_DIGEST_SIZE).digest()
+
+
+def compute_chunks(file_path):
+    """Returns iter_chunks(file_path) as a list of (length, digest)."""
+    return list(iter_chunks(file_path))
+
+
+class ChunkIndex:
+    """
+    Inverted index from chunk digest to the files containing that chunk.
+
+    The content two files share is the total length of their common chunks
+    (counting a repeated chunk as often as it occurs in both), which is read
+    off the postings of one file's chunks without touching the other file.
+    Chunks found in more than MAX_CHUNK_POSTINGS files are skipped as noise.
+    """
+
+    def __init__(self, max_postings=MAX_CHUNK_POSTINGS):
+        self.max_postings = max_postings
+        self.files = {}  # label -> (size, {digest: (length, count)})
+        self.postings = {}  # digest -> set of labels
+
+    def __len__(self):
+        return len(self.files)
+
+    def __contains__(self, label):
+        return label in self.files
+
+    def add(self, label, chunks):
+        """
+        Indexes one file.
+
+        Args:
+            label: Identifier returned by queries, usually the path.
+            chunks (iterable[tuple]): (length, digest) pairs, e.g. from iter_chunks.
+        """
+        self.remove(label)
+        counts = {}
+        size = 0
+        for length, digest in chunks:
+            size += length
+            previous = counts.get(digest)
+            counts[digest] = (length, previous[1] + 1 if previous else 1)
+        self.files[label] = (size, counts)
+        for digest in counts:
+            self.postings.setdefault(digest, set()).add(label)
+
+    def remove(self, label):
+        entry = self.files.pop(label, None)
+        if entry is None:
+            return
+        for digest in entry[1]:
+            holders = self.postings[digest]
+            holders.discard(label)
+            if not holders:
+                del self.postings[digest]
+
+    def shared_bytes(self, label):
+        """Returns {other label: bytes shared with `label`} for every file sharing at least one chunk."""
+        _, counts = self.files[label]
+        shared = {}
+        for digest, (length, count) in counts.items():
+            holders = self.postings[digest]
+            if len(holders) > self.max_postings:
+                continue
+            for other in holders:
+                if other != label:
+                    shared[other] = shared.get(other, 0) + length * min(count, self.files[other][1][digest][1])
+        return shared
+
+    def query(self, label, min_ratio):
+        """
+        Finds the files that share at least `min_ratio` of the smaller file's bytes with `label`.
+
+        Returns:
+            list[tuple]: (other label, ratio, shared bytes) sorted by decreasing ratio.
+        """
+        size = self.files[label][0]
+        found = []
+        for other, shared in self.shared_bytes(label).items():
+            smaller = min(size, self.files[other][0])
+            if smaller and shared / smaller >= min_ratio:
+                found.append((other, shared / smaller, shared))
+        return sorted(found, key=lambda x: (-x[1], str(x[0])))
+
+    def similar_pairs(self, min_ratio):
+        """
+        Self-join over every indexed file.
+
+        Returns:
+            list[tuple]: (label1, label2, ratio, shared bytes), each pair once.
+        """
+        order = {label: i for i, label in enumerate(self.files)}
+        return [
+            (label, other, ratio, shared)
+            for label in self.files
+            for other, ratio, shared in self.query(label, min_ratio)
+            if order[other] > order[label]
+        ]
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+CACHE_PATH = os.path.join(BASE_DIR, "reports", "digest_cache.sqlite")
+
+COMMIT_EVERY = 500  # stores buffered before the transaction is committed
+RACY_WINDOW_NS = 2 * 10**9  # files modified this recently are hashed but not cached
+
+
+def stat_key(st):
+    """
+    Builds the cache key for a stat result.
+
+    Args:
+        st (os.stat_result): Result of os.stat on the file.
+
+    Returns:
+        tuple: (st_dev, st_ino, st_size, st_mtime_ns)
+    """
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class DigestCache:
+    """
+    Persistent SQLite cache of file digests keyed by (st_dev, st_ino, st_size, st_mtime_ns).
+
+    A hit costs one stat call instead of a full read. In verify mode every
+    file is re-hashed anyway and compared with the cached digest; files whose
+    content changed while their metadata did not are collected in `mismatches`
+    so forensic runs can flag them.
+    """
+
+    def __init__(self, path=CACHE_PATH, verify=False):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.verify = verify
+        self.mismatches = []
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digests ("
+            " dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,"
+            " algorithm TEXT, digest TEXT, path TEXT,"
+            " PRIMARY KEY (dev, ino, size, mtime_ns, algorithm))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS digests_path ON digests (path)")
+
+    def lookup(self, st, algorithm):
+        """Returns the cached digest for a stat result, or None on a miss."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM digests WHERE dev=? AND ino=? AND size=? AND mtime_ns=? AND algorithm=?",
+                (*stat_key(st), algorithm)
+            ).fetchone()
+        return row[0] if row else None
+
+    def store(self, st, algorithm, digest, file_path):
+        """Records a digest computed for the file described by `st`."""
+        if time.time_ns() - st.st_mtime_ns < RACY_WINDOW_NS:
+            return  # mtime may not change on a write within the same tick
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*stat_key(st), algorithm, digest, file_path)
+            )
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def get_or_compute(self, file_path, algorithm, compute):
+        """
+        Returns the digest of a file, reading it only on a cache miss or in verify mode.
+
+        Args:
+            file_path (str): File to hash.
+            algorithm (str): hashlib algorithm name.
+            compute (callable): Function of file_path that computes the digest.
+
+        Returns:
+            str: Hex digest.
+        """
+        return self.get_or_compute_many(
+            file_path, [algorithm], lambda path, algorithms: {algorithm: compute(path)}
+        )[algorithm]
+
+    def get_or_compute_many(self, file_path, algorithms, compute):
+        """
+        Returns several digests of a file, computing the missing ones in one call.
+
+        Args:
+            file_path (str): File to hash.
+            algorithms (list[str]): hashlib algorithm names.
+            compute (callable): Function of (file_path, algorithms) returning {algorithm: digest}.
+
+        Returns:
+            dict: {algorithm: hex digest}
+        """
+        st = os.stat(file_path)
+        cached = {alg: self.lookup(st, alg) for alg in algorithms}
+        missing = [alg for alg in algorithms if cached[alg] is None or self.verify]
+        if not missing:
+            return cached
+
+        digests = dict(cached)
+        digests.update(compute(file_path, missing))
+        for alg in missing:
+            if cached[alg] is not None and cached[alg] != digests[alg]:
+                self.mismatches.append((file_path, alg, cached[alg], digests[alg]))
+
+        # Only cache if the file did not change while it was being read.
+        if stat_key(os.stat(file_path)) == stat_key(st):
+            for alg in missing:
+                self.store(st, alg, digests[alg], file_path)
+        return digests
+
+    def invalidate(self, file_path=None):
+        """Drops cached digests for one path, or the whole cache when no path is given."""
+        with self._lock:
+            if file_path is None:
+                self._conn.execute("DELETE FROM digests")
+            else:
+                self._conn.execute("DELETE FROM digests WHERE path=?", (file_path,))
+            self._conn.commit()
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
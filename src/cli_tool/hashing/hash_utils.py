@@ -1,12 +1,69 @@
 import hashlib
 import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-def compute_hash(file_path, hash_algorithm):
-    """Computes hash of a file using the specified algorithm."""
+from loader import digestcache
+
+PARTIAL_BLOCK_SIZE = 64 * 1024  # bytes read from each end for partial digests
+DEFAULT_HASH_WORKERS = min(8, os.cpu_count() or 1)  # hashlib releases the GIL, so threads overlap I/O and hashing
+PENDING_PER_WORKER = 4  # paths queued ahead of each worker when consuming a stream
+
+READ_BUFFER_SIZE = 1024 * 1024  # bytes read per readinto() call, shared by every requested digest
+
+def compute_digests(file_path, hash_algorithms, cache=None):
+    """
+    Computes several digests of a file in a single read.
+
+    The file is read once into a reusable buffer and every chunk is fed to all
+    requested algorithms, so MD5 + SHA-1 + SHA-256 cost one pass over the disk.
+    With a DigestCache only the algorithms it has no entry for are computed.
+
+    Args:
+        file_path (str): File to hash.
+        hash_algorithms (iterable[str]): hashlib algorithm names.
+        cache (DigestCache): Optional digest cache.
+
+    Returns:
+        dict: {algorithm: hex digest}
+    """
+    hash_algorithms = list(hash_algorithms)
+    if cache is not None:
+        return cache.get_or_compute_many(file_path, hash_algorithms, compute_digests)
+    hash_funcs = [hashlib.new(alg) for alg in hash_algorithms]
+    buffer = bytearray(READ_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while n := f.readinto(buffer):
+            chunk = view[:n]
+            for hash_func in hash_funcs:
+                hash_func.update(chunk)
+    return {alg: hash_func.hexdigest() for alg, hash_func in zip(hash_algorithms, hash_funcs)}
+
+def compute_hash(file_path, hash_algorithm, cache=None):
+    """
+    Computes hash of a file using the specified algorithm.
+
+    When a DigestCache is given, the file is only read if the cache has no
+    digest for its current (dev, inode, size, mtime).
+    """
+    return compute_digests(file_path, [hash_algorithm], cache)[hash_algorithm]
+
+def compute_partial_hash(file_path, hash_algorithm='sha256', block_size=PARTIAL_BLOCK_SIZE):
+    """
+    Computes a cheap digest over the first and last block of a file.
+
+    Files of at most two blocks are hashed in full. The result is only a
+    prefilter: equal partial digests must still be confirmed with compute_hash.
+    """
     hash_func = hashlib.new(hash_algorithm)
+    size = os.path.getsize(file_path)
     with open(file_path, 'rb') as f:
-        while chunk := f.read(4096):
-            hash_func.update(chunk)
+        if size <= 2 * block_size:
+            hash_func.update(f.read())
+        else:
+            hash_func.update(f.read(block_size))
+            f.seek(-block_size, os.SEEK_END)
+            hash_func.update(f.read(block_size))
     return hash_func.hexdigest()
 
 def compute_md5(file_path):
@@ -21,13 +78,89 @@ def compute_sha256(file_path):
     """Computes SHA-256 hash of a file."""
     return compute_hash(file_path, 'sha256')
 
-def scan_directory(directory, algorithms=['md5', 'sha1', 'sha256']):
-    """Scans a directory and computes hashes for each file."""
-    file_hashes = {}
-    
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            file_hashes[file_path] = {alg: compute_hash(file_path, alg) for alg in algorithms}
-    
-    return file_hashes
\ No newline at end of file
+def hash_files(file_paths, algorithms=('sha256',), cache=None, workers=DEFAULT_HASH_WORKERS, on_error=None):
+    """
+    Hashes many files on a thread pool, yielding results as they complete.
+
+    `file_paths` may be any iterable, including a generator that is still
+    walking a directory; only a bounded number of paths is read ahead of the
+    workers. Results arrive in completion order, not input order.
+
+    Args:
+        file_paths (iterable[str]): Files to hash.
+        algorithms (iterable[str]): hashlib algorithm names.
+        cache (DigestCache): Optional digest cache shared by all workers.
+        workers (int): Number of hashing threads; 1 hashes in the calling thread.
+        on_error (callable): Called as on_error(path, exc) for unreadable files,
+            which are then skipped. If None, the OSError is raised.
+
+    Yields:
+        tuple: (path, {algorithm: hex digest})
+    """
+    algorithms = tuple(algorithms)
+
+    def digest_all(path):
+        return path, compute_digests(path, algorithms, cache)
+
+    if workers <= 1:
+        for path in file_paths:
+            try:
+                result = digest_all(path)
+            except OSError as e:
+                if on_error is None:
+                    raise
+                on_error(path, e)
+                continue
+            yield result
+        return
+
+    paths = iter(file_paths)
+    pending = {}
+
+    def submit_next():
+        for path in paths:
+            pending[pool.submit(digest_all, path)] = path
+            return True
+        return False
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for _ in range(workers * PENDING_PER_WORKER):
+            if not submit_next():
+                break
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                submit_next()
+                try:
+                    result = future.result()
+                except OSError as e:
+                    if on_error is None:
+                        raise
+                    on_error(path, e)
+                    continue
+                yield result
+    finally:
+        for future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+
+def scan_directory(directory, algorithms=['md5', 'sha1', 'sha256'], cache=None, workers=DEFAULT_HASH_WORKERS,
+                   use_cache=True):
+    """
+    Scans a directory and computes hashes for each file.
+
+    Digests come from `cache`, or from the default persistent DigestCache
+    when none is given, so a repeat scan only reads the files that changed.
+    use_cache=False hashes every file.
+    """
+    def walk():
+        for root, _, files in os.walk(directory):
+            for file in files:
+                yield os.path.join(root, file)
+
+    if cache is not None or not use_cache:
+        return dict(hash_files(walk(), algorithms, cache, workers))
+    with digestcache.DigestCache() as cache:
+        return dict(hash_files(walk(), algorithms, cache, workers))
@@ -1,6 +1,32 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
 import cv2
 import numpy as np
 
+import loader
+
+PHASH_BITS = 64
+PHASH_CHUNK_SIZE = 32  # images per task sent to a worker, amortizes IPC
+DEFAULT_PHASH_WORKERS = os.cpu_count() or 1
+
+# Set-bit count of every byte value, used when np.bitwise_count is unavailable (NumPy < 2.0).
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _phash_bits(image_path):
+    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        raise ValueError(f"Cannot load image at path: {image_path}")
+
+    img = cv2.resize(img, (32, 32))
+    dct = cv2.dct(np.float32(img))
+    dct_low_freq = dct[:8, :8]
+    median_val = np.median(dct_low_freq)
+    return (dct_low_freq > median_val).flatten()
+
 
 def compute_phash(image_path):
     """
@@ -12,18 +38,155 @@ def compute_phash(image_path):
     Returns:
         str: A 64-character binary string representing the pHash.
     """
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise ValueError(f"Cannot load image at path: {image_path}")
+    return ''.join('1' if bit else '0' for bit in _phash_bits(image_path))
+
+
+def compute_phash_packed(image_path):
+    """
+    Computes the pHash of an image packed into a single 64-bit integer.
+
+    The first bit of the string form is the most significant bit, so
+    int_to_phash(compute_phash_packed(p)) == compute_phash(p).
+
+    Args:
+        image_path (str): Path to the input image.
+
+    Returns:
+        np.uint64: Packed pHash.
+    """
+    return np.packbits(_phash_bits(image_path)).view(">u8")[0].astype(np.uint64)
+
+
+def _phash_chunk(image_paths):
+    hashes = np.zeros(len(image_paths), dtype=np.uint64)
+    errors = {}
+    for i, path in enumerate(image_paths):
+        try:
+            hashes[i] = compute_phash_packed(path)
+        except Exception as e:
+            errors[i] = str(e)
+    return hashes, errors
 
-    img = cv2.resize(img, (32, 32))
-    dct = cv2.dct(np.float32(img))
-    dct_low_freq = dct[:8, :8]
-    median_val = np.median(dct_low_freq)
-    phash_bits = dct_low_freq > median_val
-    hash_str = ''.join('1' if bit else '0' for bit in phash_bits.flatten())
 
-    return hash_str
+def _worker_pool(workers):
+    """
+    Process pool whose workers start from a fresh interpreter, or a thread pool where none is available.
+
+    Callers may already run torch / OpenMP thread pools (e.g. once a model is
+    loaded), and forking a multithreaded process can deadlock the child, so
+    'forkserver' (or 'spawn') is used instead of 'fork'. A fresh worker does
+    not know this module under its loader name, so it registers it again
+    through loader.import_from_path before taking any task.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    method = next((m for m in ("forkserver", "spawn") if m in methods), None)
+    if method is None:
+        return ThreadPoolExecutor(workers)  # OpenCV releases the GIL while decoding and resizing
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method),
+                               initializer=loader.import_from_path, initargs=(__name__, Path(__file__)))
+
+
+def compute_phash_batch(image_paths, workers=DEFAULT_PHASH_WORKERS, chunk_size=PHASH_CHUNK_SIZE):
+    """
+    Computes the packed pHash of many images in a process pool.
+
+    Paths are sent to the workers in chunks of `chunk_size`; see _worker_pool
+    for how the workers are started.
+
+    Args:
+        image_paths (list[str]): Images to hash.
+        workers (int): Number of worker processes; 1 hashes in the calling process.
+        chunk_size (int): Images per task.
+
+    Returns:
+        tuple: (hashes, errors) where hashes is an (N,) uint64 array aligned with
+        image_paths (0 for failed images) and errors maps the index of every
+        image that could not be hashed to the error message.
+    """
+    image_paths = list(image_paths)
+    if workers <= 1 or len(image_paths) <= chunk_size:
+        return _phash_chunk(image_paths)
+
+    chunks = [image_paths[start:start + chunk_size] for start in range(0, len(image_paths), chunk_size)]
+    with _worker_pool(min(workers, len(chunks))) as executor:
+        results = list(executor.map(_phash_chunk, chunks))
+
+    errors = {}
+    for chunk_id, (_, chunk_errors) in enumerate(results):
+        errors.update({chunk_id * chunk_size + i: msg for i, msg in chunk_errors.items()})
+    return np.concatenate([hashes for hashes, _ in results]), errors
+
+
+def phash_to_int(hash_str):
+    """
+    Packs a '0'/'1' pHash string into a 64-bit integer.
+
+    Args:
+        hash_str (str): 64-character binary string from compute_phash.
+
+    Returns:
+        np.uint64: Packed pHash.
+    """
+    if len(hash_str) != PHASH_BITS:
+        raise ValueError(f"pHash must have {PHASH_BITS} bits.")
+    return np.uint64(int(hash_str, 2))
+
+
+def int_to_phash(value):
+    """
+    Unpacks a 64-bit pHash into its '0'/'1' string form.
+
+    Args:
+        value (int): Packed pHash.
+
+    Returns:
+        str: 64-character binary string.
+    """
+    return format(int(value), f"0{PHASH_BITS}b")
+
+
+def pack_phashes(hash_strs):
+    """
+    Packs a list of pHash strings into a uint64 array.
+
+    Args:
+        hash_strs (list[str]): pHash strings from compute_phash.
+
+    Returns:
+        np.ndarray: (N,) uint64 array.
+    """
+    return np.array([phash_to_int(h) for h in hash_strs], dtype=np.uint64)
+
+
+def popcount64(values):
+    """
+    Counts the set bits of every element of a uint64 array.
+
+    Args:
+        values (np.ndarray): uint64 array of any shape.
+
+    Returns:
+        np.ndarray: uint8 array of the same shape.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    as_bytes = values.reshape(-1).view(np.uint8).reshape(-1, 8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=1, dtype=np.uint8).reshape(values.shape)
+
+
+def hamming_distance_batch(query, hashes):
+    """
+    Computes the Hamming distance between one packed pHash and an array of packed pHashes.
+
+    Args:
+        query (int): Packed pHash.
+        hashes (np.ndarray): (N,) uint64 array of packed pHashes.
+
+    Returns:
+        np.ndarray: (N,) uint8 array of differing bit counts.
+    """
+    return popcount64(np.bitwise_xor(np.asarray(hashes, dtype=np.uint64), np.uint64(query)))
 
 
 def hamming_distance(hash1, hash2):
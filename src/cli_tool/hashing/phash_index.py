@@ -0,0 +1,193 @@
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+from loader import pcphash
+
+MIH_BANDS = 4  # 64-bit hashes are split into four 16-bit bands
+MIH_BAND_BITS = 64 // MIH_BANDS
+MIH_MAX_BAND_RADIUS = 2  # past 2 flipped bits per band (radius > 11) probing costs more than a scan
+SCAN_TILE_SIZE = 1024  # hashes per side of one XOR/popcount tile
+
+
+@lru_cache(maxsize=None)
+def _flip_masks(bits, radius):
+    masks = [0]
+    for flips in range(1, radius + 1):
+        for positions in combinations(range(bits), flips):
+            masks.append(sum(1 << p for p in positions))
+    return np.array(masks, dtype=np.uint64)
+
+
+class PHashIndex:
+    """
+    Radius-search index over packed 64-bit pHashes (multi-index hashing).
+
+    Each hash is split into MIH_BANDS bands, and every band keeps a sorted
+    table of its values. By the pigeonhole principle, two hashes within
+    `radius` bits agree to within radius // MIH_BANDS bits on at least one
+    band. A query therefore probes only the band values in that small
+    neighbourhood and verifies the candidates with an exact popcount.
+    Radii whose per-band radius exceeds MIH_MAX_BAND_RADIUS prune too little,
+    so they fall back to a vectorized XOR/popcount scan. This includes the
+    duplicate scanner's PHASH_MAX_DISTANCE (38 bits, 9 per band), so band
+    probing serves tight lookups such as watchlist matching.
+    """
+
+    def __init__(self, hashes=(), labels=None):
+        self.hashes = np.zeros(0, dtype=np.uint64)
+        self.labels = []
+        self._bands = None
+        self.add_many(hashes, labels)
+
+    def __len__(self):
+        return len(self.labels)
+
+    def add(self, phash, label=None):
+        """
+        Inserts one packed pHash.
+
+        Args:
+            phash (int): Packed pHash.
+            label: Value returned by queries for this entry; defaults to its insertion index.
+        """
+        self.add_many([phash], [label])
+
+    def add_many(self, hashes, labels=None):
+        """Inserts packed pHashes with optional labels (defaults to insertion indices)."""
+        hashes = np.asarray(hashes, dtype=np.uint64).reshape(-1)
+        if labels is None:
+            labels = [None] * len(hashes)
+        start = len(self.labels)
+        self.hashes = np.concatenate([self.hashes, hashes])
+        self.labels.extend(start + i if label is None else label for i, label in enumerate(labels))
+        self._bands = None  # rebuilt lazily on the next query
+
+    def _band_values(self, hashes, band):
+        shift = np.uint64(band * MIH_BAND_BITS)
+        return (hashes >> shift) & np.uint64((1 << MIH_BAND_BITS) - 1)
+
+    def _build_bands(self):
+        self._bands = []
+        for band in range(MIH_BANDS):
+            values = self._band_values(self.hashes, band)
+            order = np.argsort(values, kind="stable")
+            self._bands.append((values[order], order))
+
+    def _positions_within(self, phash, radius):
+        phash = np.uint64(phash)
+        band_radius = radius // MIH_BANDS
+        if band_radius > MIH_MAX_BAND_RADIUS:
+            dists = pcphash.popcount64(self.hashes ^ phash)
+            hits = np.flatnonzero(dists <= radius)
+            return hits, dists[hits]
+
+        if self._bands is None:
+            self._build_bands()
+        masks = _flip_masks(MIH_BAND_BITS, band_radius)
+        candidates = []
+        for band, (sorted_values, order) in enumerate(self._bands):
+            probes = np.unique(self._band_values(phash, band) ^ masks)
+            lo = np.searchsorted(sorted_values, probes, side="left")
+            hi = np.searchsorted(sorted_values, probes, side="right")
+            for start, stop in zip(lo[hi > lo], hi[hi > lo]):
+                candidates.append(order[start:stop])
+        if not candidates:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.uint8)
+        candidates = np.unique(np.concatenate(candidates))
+        dists = pcphash.popcount64(self.hashes[candidates] ^ phash)
+        keep = dists <= radius
+        return candidates[keep], dists[keep]
+
+    def query(self, phash, radius):
+        """
+        Finds every indexed hash within `radius` bits of `phash`.
+
+        Args:
+            phash (int): Packed pHash to look up.
+            radius (int): Maximum Hamming distance.
+
+        Returns:
+            list[tuple]: (label, distance) pairs sorted by distance.
+        """
+        positions, dists = self._positions_within(phash, radius)
+        order = np.lexsort((positions, dists))
+        return [(self.labels[positions[i]], int(dists[i])) for i in order]
+
+    def radius_pairs(self, radius):
+        """
+        Self-join: every pair of indexed hashes within `radius` bits.
+
+        Returns:
+            tuple: (rows, cols, dists) numpy arrays of insertion positions, rows < cols.
+        """
+        found_r, found_c, found_d = [], [], []
+        n = len(self.hashes)
+        if radius // MIH_BANDS <= MIH_MAX_BAND_RADIUS:
+            for position, phash in enumerate(self.hashes):
+                others, dists = self._positions_within(phash, radius)
+                keep = others > position
+                found_r.append(np.full(int(keep.sum()), position, dtype=np.intp))
+                found_c.append(others[keep])
+                found_d.append(dists[keep])
+        else:
+            for row_start in range(0, n, SCAN_TILE_SIZE):
+                row_block = self.hashes[row_start:row_start + SCAN_TILE_SIZE, None]
+                for col_start in range(row_start, n, SCAN_TILE_SIZE):
+                    dists = pcphash.popcount64(row_block ^ self.hashes[None, col_start:col_start + SCAN_TILE_SIZE])
+                    hit = dists <= radius
+                    if col_start == row_start:
+                        hit &= np.triu(np.ones_like(hit), k=1)
+                    rows, cols = np.nonzero(hit)
+                    found_r.append(rows + row_start)
+                    found_c.append(cols + col_start)
+                    found_d.append(dists[rows, cols])
+        if not found_r:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp), np.empty(0, dtype=np.uint8)
+        return (np.concatenate(found_r).astype(np.intp), np.concatenate(found_c).astype(np.intp),
+                np.concatenate(found_d).astype(np.uint8))
+
+
+def parse_phash(text):
+    """
+    Parses a pHash written as 64 binary digits, 16 hex digits, or 0x-prefixed hex.
+
+    Returns:
+        int: Packed pHash.
+    """
+    text = text.strip().lower()
+    if len(text) == 64 and set(text) <= {"0", "1"}:
+        return int(text, 2)
+    value = int(text[2:] if text.startswith("0x") else text, 16)
+    if value >= 1 << 64:
+        raise ValueError(f"pHash does not fit in 64 bits: {text}")
+    return value
+
+
+def load_watchlist(path):
+    """
+    Loads a watchlist of known pHashes into a PHashIndex.
+
+    Each non-empty line holds a pHash (binary or hex) optionally followed by a
+    comma and a label, e.g. `c3a1f00e9b7d2244,case-1142/exhibit-7`. Lines starting
+    with '#' are ignored. Entries without a label are labelled with their pHash.
+
+    Args:
+        path (str): Watchlist file.
+
+    Returns:
+        PHashIndex: Index whose labels are the watchlist labels.
+    """
+    hashes, labels = [], []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            phash_text, _, label = line.partition(",")
+            try:
+                hashes.append(parse_phash(phash_text))
+            except ValueError as e:
+                raise ValueError(f"{path}:{line_no}: invalid pHash '{phash_text}' ({e})") from None
+            labels.append(label.strip() or phash_text.strip())
+    return PHashIndex(hashes, labels)
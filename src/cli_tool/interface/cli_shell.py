@@ -40,14 +40,7 @@ def check_ai_model(name, loader_func):
         return False
 
 def boot_diagnostics():
-    from loader import (
-        daily_snapshot, scan_duplicates, tracker,
-        resnet18_model, resnet50_model, resnet101_model,
-        efficientnet_b1_model, efficientnet_b3_model,
-        clip_model, dinov2_model,
-        sbert_model, sbert_deep_model,
-        codebert_model
-    )
+    from loader import daily_snapshot, scan_duplicates, tracker, model_registry
 
     print(f"{INFO}[*] Booting Dupli-HQ modules and AI models...\n{RESET}")
     all_ok = True
@@ -66,16 +59,9 @@ def boot_diagnostics():
             print(f"{ERROR}[!] Failed{RESET}")
             all_ok = False
 
-    all_ok &= check_ai_model("resnet18", resnet18_model.load_model)
-    all_ok &= check_ai_model("resnet50", resnet50_model.load_model)
-    all_ok &= check_ai_model("resnet101", resnet101_model.load_model)
-    all_ok &= check_ai_model("efficientnet_b1", efficientnet_b1_model.load_model)
-    all_ok &= check_ai_model("efficientnet_b3", efficientnet_b3_model.load_model)
-    all_ok &= check_ai_model("clip", clip_model.load_model)
-    all_ok &= check_ai_model("dinov2", dinov2_model.load_model)
-    all_ok &= check_ai_model("sbert", sbert_model.load_model)
-    all_ok &= check_ai_model("sbert_deep", sbert_deep_model.load_model)
-    all_ok &= check_ai_model("codebert", lambda: codebert_model.load_model()[1])
+    # Models are loaded into the shared registry, so later runs reuse these instances.
+    for name in model_registry.MODEL_SPECS:
+        all_ok &= check_ai_model(name, lambda name=name: model_registry.get_model(name))
 
     if all_ok:
         print(f"\n{SUCCESS}🧠 AI engines and forensic modules initialized.{RESET}\n")
@@ -149,7 +135,7 @@ Usage:
                 self.daily_snapshot.main(path)
 
             elif mode == "duplicates":
-                results = self.scan_duplicates.scan_folder_for_duplicates(path)
+                results, _ = self.scan_duplicates.scan_folder_for_duplicates(path)
                 if results:
                     print(f"{SUCCESS}🔍 Duplicates Found:{RESET}")
                     for f1, f2, label in results:
@@ -1,15 +1,11 @@
 import argparse
 import os
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Import all models and tools via loader
 from loader import (
-    resnet18_model, resnet50_model, resnet101_model,
-    efficientnet_b1_model, efficientnet_b3_model,
-    clip_model, dinov2_model,
-    sbert_model, sbert_deep_model,
-    codebert_model,
+    simengine,
+    model_registry,
     daily_snapshot,
     scan_duplicates,
     tracker
@@ -26,46 +22,10 @@ def detect_file_type(file_path):
     return "unknown"
 
 def load_model_by_name(name):
+    if name not in model_registry.MODEL_SPECS:
+        return None, None
     try:
-        if name == "clip":
-            model, preprocess = clip_model.load_model()
-            return (model, preprocess), clip_model
-
-        elif name == "dinov2":
-            model = dinov2_model.load_model()
-            transform = dinov2_model.get_transform()
-            return (model, transform), dinov2_model
-
-        elif name == "resnet50":
-            model = resnet50_model.load_model()
-            transform = resnet50_model.get_transform()
-            return (model, transform), resnet50_model
-
-        elif name == "resnet18":
-            return resnet18_model.load_model(), resnet18_model
-
-        elif name == "resnet101":
-            return resnet101_model.load_model(), resnet101_model
-
-        elif name == "efficientnet_b1":
-            return efficientnet_b1_model.load_model(), efficientnet_b1_model
-
-        elif name == "efficientnet_b3":
-            return efficientnet_b3_model.load_model(), efficientnet_b3_model
-
-        elif name == "sbert":
-            return sbert_model.load_model(), sbert_model
-
-        elif name == "sbert_deep":
-            return sbert_deep_model.load_model(), sbert_deep_model
-
-        elif name == "codebert":
-            tokenizer, model = codebert_model.load_model()
-            return (tokenizer, model), codebert_model
-
-        else:
-            return None, None
-
+        return model_registry.get_model(name), model_registry.get_module(name)
     except Exception as e:
         print(f"❌ Error loading model '{name}': {e}")
         return None, None
@@ -80,6 +40,7 @@ def main():
         parser.add_argument("--auto", action="store_true", help="Auto-select model based on file type")
         parser.add_argument("--mode", choices=["compare", "snapshot", "duplicates", "tracker"], help="Mode to run")
         parser.add_argument("--folder", help="Target folder for snapshot, duplicates, or tracker mode")
+        parser.add_argument("--events", action="store_true", help="Tracker mode: react to file system events instead of polling")
         args = parser.parse_args()
 
         # === Mode: snapshot ===
@@ -95,7 +56,7 @@ def main():
             if not args.folder:
                 print("❌ Please provide --folder with duplicates mode.")
                 return
-            results = scan_duplicates.scan_folder_for_duplicates(args.folder)
+            results, _ = scan_duplicates.scan_folder_for_duplicates(args.folder)
             if results:
                 print("🔍 Duplicates Found:")
                 for f1, f2, label in results:
@@ -112,7 +73,10 @@ def main():
                 print("❌ Please provide --folder with tracker mode.")
                 return
             print("🛰️ Starting live monitoring tracker...\n")
-            tracker.monitor_folder(args.folder)
+            if args.events:
+                tracker.monitor_folder_events(args.folder)
+            else:
+                tracker.monitor_folder(args.folder)
             return
 
         # === Mode: compare ===
@@ -181,7 +145,7 @@ def main():
             print("❌ One or both feature vectors are not valid numpy arrays.")
             return
 
-        similarity = cosine_similarity([vec1], [vec2])[0][0]
+        similarity = simengine.cosine(vec1, vec2)
 
         print(f"Similarity: {similarity:.4f}")
 
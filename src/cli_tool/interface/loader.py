@@ -7,6 +7,7 @@
 
 from pathlib import Path
 import importlib.util
+import sys
 
 def find_project_root(marker_files=("pyproject.toml", ".git", "requirements.txt")):
     current = Path(__file__).resolve()
@@ -32,12 +33,26 @@ module_tree = {
     "sbert_model": project_root / "src" / "ai_model" / "sbert_model.py",
     "sbert_deep_model": project_root / "src" / "ai_model" / "sbert_deep_model.py",
     "codebert_model": project_root / "src" / "ai_model" / "codebert_model.py",
+    "imagebatch": project_root / "src" / "ai_model" / "image_batch.py",
+    "textwindows": project_root / "src" / "ai_model" / "text_windows.py",
     "pcphash": project_root / "src" / "cli_tool" / "hashing" / "perceptual_hash.py",
     "utilhash": project_root / "src" / "cli_tool" / "hashing" / "hash_utils.py",
+    "digestcache": project_root / "src" / "cli_tool" / "hashing" / "digest_cache.py",
+    "phashindex": project_root / "src" / "cli_tool" / "hashing" / "phash_index.py",
+    "chunkindex": project_root / "src" / "cli_tool" / "hashing" / "chunk_index.py",
+    "simengine": project_root / "src" / "cli_tool" / "similarity" / "similarity_engine.py",
+    "annindex": project_root / "src" / "cli_tool" / "similarity" / "ann_index.py",
+    "minhashlsh": project_root / "src" / "cli_tool" / "similarity" / "minhash_lsh.py",
+    "quantize": project_root / "src" / "cli_tool" / "similarity" / "quantization.py",
+    "clustering": project_root / "src" / "cli_tool" / "similarity" / "clustering.py",
     "cli_shell": project_root / "src" / "cli_tool" / "interface" / "cli_shell.py",
     "commands": project_root / "src" / "cli_tool" / "interface" / "commands.py",
     "daily_snapshot": project_root / "src" / "cli_tool" / "automation" / "daily_snapshot.py",
     "scan_duplicates": project_root / "src" / "cli_tool" / "automation" / "scan_duplicates.py",
+    "model_registry": project_root / "src" / "cli_tool" / "automation" / "model_registry.py",
+    "textcache": project_root / "src" / "cli_tool" / "automation" / "text_cache.py",
+    "fswatch": project_root / "src" / "cli_tool" / "automation" / "fs_watch.py",
+    "dupindex": project_root / "src" / "cli_tool" / "automation" / "duplicate_index.py",
     "tracker": project_root / "src" / "cli_tool" / "automation" / "folder_tracker.py",
     "logger": project_root / "src" / "cli_tool" / "interface" / "logger.py",
 }
@@ -51,6 +66,7 @@ def import_from_path(name: str, file_path: Path):
         raise FileNotFoundError(f"Module file not found: {file_path}")
     spec = importlib.util.spec_from_file_location(name, file_path)
     module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # lets pickle (e.g. process pools) resolve functions defined in the module
     spec.loader.exec_module(module)
     return module
 
@@ -0,0 +1,145 @@
+import numpy as np
+
+DEFAULT_N_PROBE = 8  # inverted lists visited per query; higher = better recall, slower
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE_PER_LIST = 64  # training vectors drawn per list when fitting centroids
+QUERY_BLOCK_SIZE = 4096  # query rows multiplied against one list at a time
+
+
+def _as_rows(matrix):
+    # A QuantizedMatrix already returns float32 rows when indexed; anything else becomes a float32 array.
+    return matrix if hasattr(matrix, "codes") else np.asarray(matrix, dtype=np.float32)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index over L2-normalized embeddings.
+
+    Vectors are partitioned by a spherical k-means coarse quantizer. A query
+    only visits its `n_probe` closest partitions, and every candidate found
+    there is re-scored with the exact cosine before the threshold is applied,
+    so the index can miss pairs (recall < 1) but never reports a false one.
+    """
+
+    def __init__(self, n_lists=None, n_probe=DEFAULT_N_PROBE, seed=0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.data = None
+        self.centroids = None
+        self.list_of = None
+        self.lists = []
+
+    def build(self, normed):
+        """
+        Trains the coarse quantizer and fills the inverted lists.
+
+        Args:
+            normed (np.ndarray): (N x D) L2-normalized float32 matrix, or a normalized
+                quantize.QuantizedMatrix, kept encoded and decoded list by list.
+
+        Returns:
+            IVFIndex: self, for chaining.
+        """
+        self.data = _as_rows(normed)
+        n = len(self.data)
+        n_lists = self.n_lists or max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n) if n else 1
+
+        self.centroids = self._train_centroids(n_lists)
+        self.list_of = self._nearest_lists(self.data, 1)[:, 0]
+        order = np.argsort(self.list_of, kind="stable")
+        bounds = np.searchsorted(self.list_of[order], np.arange(len(self.centroids) + 1))
+        self.lists = [order[bounds[i]:bounds[i + 1]] for i in range(len(self.centroids))]
+        return self
+
+    def _train_centroids(self, n_lists):
+        rng = np.random.default_rng(self.seed)
+        n = len(self.data)
+        if n == 0:
+            return np.zeros((1, self.data.shape[1]), dtype=np.float32)
+
+        sample_size = min(n, n_lists * KMEANS_SAMPLE_PER_LIST)
+        sample = self.data[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            counts = np.bincount(assignment, minlength=n_lists)
+            empty = counts == 0
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+        return centroids
+
+    def _nearest_lists(self, queries, n_probe):
+        n_probe = min(n_probe, len(self.centroids))
+        probes = np.empty((len(queries), n_probe), dtype=np.intp)
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            scores = queries[start:start + QUERY_BLOCK_SIZE] @ self.centroids.T
+            if n_probe < scores.shape[1]:
+                probes[start:start + QUERY_BLOCK_SIZE] = np.argpartition(-scores, n_probe - 1, axis=1)[:, :n_probe]
+            else:
+                probes[start:start + QUERY_BLOCK_SIZE] = np.arange(n_probe)
+        return probes
+
+    def search(self, queries, threshold):
+        """
+        Finds indexed vectors with cosine similarity >= threshold to each query.
+
+        Args:
+            queries (np.ndarray): (M x D) L2-normalized query matrix.
+            threshold (float): Minimum exact cosine similarity to report.
+
+        Returns:
+            tuple: (query_rows, index_rows, sims) numpy arrays.
+        """
+        queries = _as_rows(queries)
+        probes = self._nearest_lists(queries, self.n_probe)
+
+        # Group queries by the list they probe so each list is scored with one matmul.
+        flat_queries = np.repeat(np.arange(len(queries)), probes.shape[1])
+        flat_lists = probes.ravel()
+        order = np.argsort(flat_lists, kind="stable")
+        flat_queries, flat_lists = flat_queries[order], flat_lists[order]
+        bounds = np.searchsorted(flat_lists, np.arange(len(self.centroids) + 1))
+
+        found_q, found_i, found_s = [], [], []
+        for list_id, members in enumerate(self.lists):
+            probing = flat_queries[bounds[list_id]:bounds[list_id + 1]]
+            if len(members) == 0 or len(probing) == 0:
+                continue
+            member_vectors = self.data[members]
+            for start in range(0, len(probing), QUERY_BLOCK_SIZE):
+                block = probing[start:start + QUERY_BLOCK_SIZE]
+                scores = queries[block] @ member_vectors.T
+                rows, cols = np.nonzero(scores >= threshold)
+                if len(rows):
+                    found_q.append(block[rows])
+                    found_i.append(members[cols])
+                    found_s.append(np.clip(scores[rows, cols], -1.0, 1.0))
+
+        if not found_q:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty.copy(), np.empty(0, dtype=np.float32)
+        return np.concatenate(found_q), np.concatenate(found_i), np.concatenate(found_s)
+
+    def similar_pairs(self, threshold):
+        """
+        Self-join: every indexed pair (i, j), i < j, with cosine similarity >= threshold.
+
+        A pair is kept if it is found from either side, then de-duplicated.
+
+        Returns:
+            tuple: (rows, cols, sims) numpy arrays.
+        """
+        q, i, s = self.search(self.data, threshold)
+        keep = q != i
+        q, i, s = q[keep], i[keep], s[keep]
+        rows, cols = np.minimum(q, i), np.maximum(q, i)
+        keys = rows.astype(np.int64) * len(self.data) + cols
+        _, first = np.unique(keys, return_index=True)
+        return rows[first], cols[first], s[first]
@@ -0,0 +1,143 @@
+from collections import deque
+
+EXACT_TAG = "EXACT_DUPLICATE"  # tag of findings between byte-identical files
+
+
+class UnionFind:
+    """
+    Disjoint-set forest over hashable items, with union by size and path halving.
+
+    Items are added implicitly the first time they are seen.
+    """
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def __contains__(self, item):
+        return item in self.parent
+
+    def find(self, item):
+        """Returns the root of the set containing `item`."""
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+            return item
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a, b):
+        """
+        Merges the sets containing `a` and `b`.
+
+        Returns:
+            bool: False if they were already in the same set.
+        """
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        return True
+
+    def connected(self, a, b):
+        return a in self.parent and b in self.parent and self.find(a) == self.find(b)
+
+    def groups(self):
+        """Returns every set as a list of items."""
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+class DuplicateClusters:
+    """
+    Merges pairwise duplicate findings into clusters.
+
+    Only findings that join two different clusters are kept as edges, so a
+    group of N copies costs N - 1 edges however many pairs were matched.
+    Each cluster elects as representative the member with the most kept
+    matches (ties go to the smallest path). Every other member is reported
+    with the finding that links it to the member one step closer to the
+    representative.
+    """
+
+    def __init__(self):
+        self.sets = UnionFind()
+        self.edges = {}  # file -> [(other file, tag)]
+
+    def add_match(self, file1, file2, tag):
+        """
+        Records a finding.
+
+        Returns:
+            bool: False if both files were already in the same cluster (the finding is dropped).
+        """
+        if not self.sets.union(file1, file2):
+            return False
+        self.edges.setdefault(file1, []).append((file2, tag))
+        self.edges.setdefault(file2, []).append((file1, tag))
+        return True
+
+    def connected(self, file1, file2):
+        return self.sets.connected(file1, file2)
+
+    def clusters(self, similarity=None):
+        """
+        Args:
+            similarity (callable): similarity(file1, file2) -> float, or None when
+                the two files cannot be compared (e.g. no embedding).
+
+        Returns:
+            list[dict]: {"representative", "size", "members"} per cluster, largest first.
+            Each member is {"file", "match_type", "matched_to", "similarity"}:
+            match_type is the finding that joined it to matched_to, similarity
+            its score against the representative. Exact copies of the
+            representative score 1.0; other members are scored with
+            `similarity`, tried on exact copies of either side when the file
+            itself cannot be compared, and get None when no pair can be.
+        """
+        exact = UnionFind()
+        for file, links in self.edges.items():
+            for other, tag in links:
+                if tag == EXACT_TAG:
+                    exact.union(file, other)
+        copies = {}
+        for group in exact.groups():
+            for item in group:
+                copies[item] = [item] + sorted(other for other in group if other != item)
+
+        def score(member, representative):
+            if exact.connected(member, representative):
+                return 1.0
+            if similarity is None:
+                return None
+            for file1 in copies.get(member, [member]):
+                for file2 in copies.get(representative, [representative]):
+                    sim = similarity(file1, file2)
+                    if sim is not None:
+                        return float(sim)
+            return None
+
+        clusters = []
+        for members in self.sets.groups():
+            representative = min(members, key=lambda path: (-len(self.edges[path]), path))
+            entries = []
+            seen = {representative}
+            queue = deque([representative])
+            while queue:
+                current = queue.popleft()
+                for other, tag in sorted(self.edges[current]):
+                    if other in seen:
+                        continue
+                    seen.add(other)
+                    entries.append({"file": other, "match_type": tag, "matched_to": current,
+                                    "similarity": score(other, representative)})
+                    queue.append(other)
+            clusters.append({"representative": representative, "size": len(members), "members": entries})
+        return sorted(clusters, key=lambda c: (-c["size"], c["representative"]))
@@ -0,0 +1,75 @@
+import re
+import numpy as np
+from datasketch import LeanMinHash, MinHash, MinHashLSH
+
+NUM_PERM = 128  # MinHash permutations; the Jaccard estimate has a standard error of about 1 / sqrt(NUM_PERM)
+SHINGLE_TOKENS = 3  # tokens per shingle
+DEFAULT_JACCARD_THRESHOLD = 0.3  # estimated shingle Jaccard a pair needs to be proposed
+MINHASH_SEED = 1  # fixed so signatures are comparable across runs
+
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def shingles(text, k=SHINGLE_TOKENS):
+    """
+    Returns the set of k-token shingles of a text, encoded as bytes.
+
+    Tokens are lowercased words and single punctuation characters, so
+    whitespace and layout changes (re-indented code, re-wrapped prose) do not
+    change the set. Texts shorter than k tokens become one shingle.
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) <= k:
+        return {" ".join(tokens).encode("utf-8")} if tokens else set()
+    return {" ".join(tokens[i:i + k]).encode("utf-8") for i in range(len(tokens) - k + 1)}
+
+
+def compute_minhash(text, num_perm=NUM_PERM, k=SHINGLE_TOKENS):
+    """
+    Computes the MinHash signature of a text's shingles.
+
+    Returns:
+        LeanMinHash: Or None if the text has no tokens.
+    """
+    shingle_set = shingles(text, k)
+    if not shingle_set:
+        return None
+    signature = MinHash(num_perm=num_perm, seed=MINHASH_SEED)
+    signature.update_batch(shingle_set)
+    return LeanMinHash(signature)
+
+
+def candidate_pairs(signatures, threshold=DEFAULT_JACCARD_THRESHOLD, num_perm=NUM_PERM):
+    """
+    Proposes the pairs whose estimated Jaccard similarity reaches `threshold`.
+
+    Signatures go into an LSH banding index tuned for `threshold`, so each
+    file is only checked against the files sharing at least one band with it;
+    those candidates are then kept if their signature estimate clears the bar.
+
+    Args:
+        signatures (list): One MinHash per file, or None for files without a signature.
+
+    Returns:
+        tuple: (rows, cols, jaccards) numpy arrays of positions in `signatures`, rows < cols.
+    """
+    lsh = MinHashLSH(threshold=threshold, num_perm=num_perm)
+    for i, signature in enumerate(signatures):
+        if signature is not None:
+            lsh.insert(i, signature)
+
+    rows, cols, jaccards = [], [], []
+    for i, signature in enumerate(signatures):
+        if signature is None:
+            continue
+        for j in lsh.query(signature):
+            if j <= i:
+                continue
+            estimate = signature.jaccard(signatures[j])
+            if estimate >= threshold:
+                rows.append(i)
+                cols.append(j)
+                jaccards.append(estimate)
+    order = np.lexsort((cols, rows))
+    return (np.asarray(rows, dtype=np.intp)[order], np.asarray(cols, dtype=np.intp)[order],
+            np.asarray(jaccards, dtype=np.float32)[order])
@@ -0,0 +1,169 @@
+import numpy as np
+
+EMBEDDING_DTYPES = ("float32", "float16", "int8")
+DEFAULT_EMBEDDING_DTYPE = "float32"
+INT8_LEVELS = 127  # symmetric int8 codes in [-127, 127]; -128 is never used
+FLOAT16_RELATIVE_ERROR = 2.0 ** -11  # round-to-nearest unit roundoff for normal float16 values
+FLOAT16_SUBNORMAL_ERROR = 2.0 ** -25  # absolute rounding error below the normal float16 range
+
+
+def quantize(vectors, dtype=DEFAULT_EMBEDDING_DTYPE):
+    """
+    Encodes vectors along their last axis as float32, float16 or per-vector-scaled int8.
+
+    int8 codes are round(x / scale) with scale = max|x| / 127 per vector, so
+    every vector uses the full code range whatever its magnitude.
+
+    Returns:
+        tuple: (codes, scales) where scales has the shape of `vectors` without the
+        last axis (all ones for the float types).
+    """
+    if dtype not in EMBEDDING_DTYPES:
+        raise ValueError(f"Unsupported embedding dtype {dtype!r} (expected one of {', '.join(EMBEDDING_DTYPES)})")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype != "int8":
+        return vectors.astype(dtype), np.ones(vectors.shape[:-1], dtype=np.float32)
+    scales = np.max(np.abs(vectors), axis=-1) / INT8_LEVELS
+    safe = np.where(scales > 0, scales, 1.0)[..., None]
+    codes = np.clip(np.rint(vectors / safe), -INT8_LEVELS, INT8_LEVELS).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize(codes, scales, normalize=False):
+    """
+    Decodes quantize() output back to float32, optionally scaling every vector to unit length.
+    """
+    vectors = codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+    if normalize:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors /= norms
+    return vectors
+
+
+def angle_error(codes, scales):
+    """
+    Upper bound, in radians, on the angle between each original vector and its decoded version.
+
+    float16 rounds every component to within 2^-11 of its value (2^-25
+    absolute below the normal range); int8 to within scale / 2. With `e` the
+    resulting bound on the error norm and `n` the decoded norm, the original
+    norm is at least n - e and the angle at most asin(e / (n - e)). Vectors
+    stored as float32 get 0.
+
+    For int8 this is about k / 254 radians, with k = sqrt(D) * max|x| / |x|
+    the peak ratio of the vector: ~4 for Gaussian-like embeddings, more when
+    a few dimensions dominate. float16 gives about 5e-4 whatever the vector.
+
+    Returns:
+        np.ndarray: One bound per vector.
+    """
+    dim = codes.shape[-1]
+    decoded = np.linalg.norm(dequantize(codes, scales), axis=-1)
+    if codes.dtype == np.int8:
+        error = np.asarray(scales, dtype=np.float64) * np.sqrt(dim) / 2
+    elif codes.dtype == np.float16:
+        error = FLOAT16_RELATIVE_ERROR * decoded / (1 - FLOAT16_RELATIVE_ERROR) + FLOAT16_SUBNORMAL_ERROR * np.sqrt(dim)
+    else:
+        return np.zeros(decoded.shape)
+    original = decoded - error
+    ratio = np.where(original > 0, error / np.where(original > 0, original, 1.0), 1.0)
+    return np.arcsin(np.minimum(ratio, 1.0))
+
+
+def cosine_error_bound(sims, delta1, delta2):
+    """
+    Bounds |cos(original pair) - cos(decoded pair)| from the decoded similarity and both angle errors.
+
+    Each vector moves by at most its angle error, so the pair's angle moves
+    by at most eps = delta1 + delta2. With the decoded angle t and
+    cos(t + d) - cos(t) = -sin(t) sin(d) - cos(t) (1 - cos(d)), the change
+    is at most sin(t_orig) * eps + eps^2 / 2, and sin(t_orig) <= sin(t) + eps.
+    Near the 0.75 duplicate threshold (sin t ~ 0.66) this is about 0.7 * eps:
+    at most ~7e-4 for float16 and ~k / 190 for int8 (about 0.02 for k = 4).
+    These are worst cases; rounding errors mostly cancel, and the errors
+    actually seen are several times smaller (see testing/test-quantization.py).
+
+    Returns:
+        np.ndarray: One bound per pair.
+    """
+    eps = np.asarray(delta1, dtype=np.float64) + np.asarray(delta2, dtype=np.float64)
+    sims = np.clip(np.asarray(sims, dtype=np.float64), -1.0, 1.0)
+    return (np.sqrt(1 - sims ** 2) + eps) * eps + eps ** 2 / 2
+
+
+class QuantizedMatrix:
+    """
+    (N x D) embedding matrix held as float32, float16 or per-row-scaled int8 codes.
+
+    Rows are decoded only when they are read: indexing (a slice, an index
+    array) returns float32 rows, so the similarity engine and the ANN index
+    can take a QuantizedMatrix wherever they take a normalized matrix, and
+    only one tile is ever decoded at a time. With `normalized`, rows are
+    L2-normalized before encoding and again after decoding.
+
+    Memory per row is 4 * D bytes for float32, 2 * D for float16 and D + 4 for
+    int8 (codes plus one float32 scale), against ~30 * D bytes for a Python
+    list of floats. See angle_error and cosine_error_bound for the error this costs.
+    """
+
+    def __init__(self, codes, scales, normalized=True):
+        self.codes = codes
+        self.scales = scales
+        self.normalized = normalized
+
+    @classmethod
+    def from_float(cls, matrix, dtype=DEFAULT_EMBEDDING_DTYPE, normalize=True):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        if normalize:
+            norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+            norms[norms == 0] = 1.0
+            matrix = matrix / norms
+        return cls(*quantize(matrix, dtype), normalized=normalize)
+
+    @classmethod
+    def stack(cls, rows, dim=None, dtype=DEFAULT_EMBEDDING_DTYPE, normalized=True):
+        """
+        Builds a matrix from (codes, scale) rows, e.g. from row(); None rows become zero vectors.
+        """
+        present = [row for row in rows if row is not None]
+        if present:
+            dim, dtype = present[0][0].shape[0], present[0][0].dtype
+        codes = np.zeros((len(rows), dim or 0), dtype=dtype)
+        scales = np.zeros(len(rows), dtype=np.float32)
+        for i, row in enumerate(rows):
+            if row is not None:
+                codes[i], scales[i] = row
+        return cls(codes, scales, normalized)
+
+    @property
+    def dtype(self):
+        return self.codes.dtype.name
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + (self.scales.nbytes if self.codes.dtype == np.int8 else 0)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if self.codes.dtype == np.float32:
+            return self.codes[index]  # stored exactly (and already normalized): nothing to decode
+        return dequantize(self.codes[index], self.scales[index], self.normalized)
+
+    def row(self, i):
+        """Returns a copy of the stored (codes, scale) of one row, so it does not keep this matrix alive."""
+        return self.codes[i].copy(), self.scales[i]
+
+    def take(self, rows):
+        """Returns the rows at the given positions as a new QuantizedMatrix, still encoded."""
+        return QuantizedMatrix(self.codes[rows], self.scales[rows], self.normalized)
+
+    def angle_error(self):
+        """Per-row bound from angle_error(); rows stored as float32 get 0."""
+        return angle_error(self.codes, self.scales)
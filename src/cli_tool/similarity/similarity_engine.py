@@ -0,0 +1,113 @@
+import numpy as np
+
+DEFAULT_TILE_SIZE = 1024  # rows per tile; a tile's score block is TILE x TILE float32
+PAIR_CHUNK_SIZE = 65536  # pairs scored per step in pair_similarities
+
+
+def l2_normalize(matrix):
+    """
+    Returns a float32 copy of `matrix` with every row scaled to unit length.
+
+    Rows with zero norm are left as zeros, so they score 0 against everything.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def cosine(vec1, vec2):
+    """
+    Computes the cosine similarity between two vectors.
+
+    Args:
+        vec1 (np.ndarray): First vector.
+        vec2 (np.ndarray): Second vector of the same shape.
+
+    Returns:
+        float: Cosine similarity in [-1, 1].
+    """
+    if np.shape(vec1) != np.shape(vec2):
+        raise ValueError("Vectors must have the same shape.")
+    return float(np.clip(np.dot(l2_normalize(vec1), l2_normalize(vec2)), -1.0, 1.0))
+
+
+def rowwise_similarity(matrix1, matrix2):
+    """
+    Computes the cosine similarity of each row of `matrix1` with the same row of `matrix2`.
+
+    Returns:
+        np.ndarray: (N,) float32 similarities.
+    """
+    if np.shape(matrix1) != np.shape(matrix2):
+        raise ValueError("Matrices must have the same shape.")
+    sims = np.einsum("ij,ij->i", l2_normalize(matrix1), l2_normalize(matrix2))
+    return np.clip(sims, -1.0, 1.0)
+
+
+def pair_similarities(normed, rows, cols):
+    """
+    Scores an explicit list of pairs against an already normalized matrix.
+
+    Args:
+        normed (np.ndarray): (N x D) matrix from l2_normalize, or a normalized quantize.QuantizedMatrix.
+        rows (array-like): First index of each pair.
+        cols (array-like): Second index of each pair.
+
+    Returns:
+        np.ndarray: (P,) float32 similarities aligned with the pairs.
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    cols = np.asarray(cols, dtype=np.intp)
+    sims = np.empty(len(rows), dtype=np.float32)
+    for start in range(0, len(rows), PAIR_CHUNK_SIZE):
+        stop = start + PAIR_CHUNK_SIZE
+        sims[start:stop] = np.einsum("ij,ij->i", normed[rows[start:stop]], normed[cols[start:stop]])
+    return np.clip(sims, -1.0, 1.0)
+
+
+def iter_similar_pairs(normed, threshold, other=None, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Yields every pair whose cosine similarity is at least `threshold`, one tile at a time.
+
+    Without `other`, pairs (i, j) with i < j are taken within `normed`.
+    With `other`, pairs (i, j) index `normed` and `other` respectively.
+    Only a tile_size x tile_size block of scores is held in memory at once.
+
+    Args:
+        normed (np.ndarray): (N x D) matrix from l2_normalize, or a normalized quantize.QuantizedMatrix
+            (decoded one tile at a time).
+        threshold (float): Minimum similarity to report.
+        other (np.ndarray, optional): (M x D) normalized matrix to compare against.
+        tile_size (int): Rows per tile.
+
+    Yields:
+        tuple: (rows, cols, sims) numpy arrays for the matches found in one tile.
+    """
+    self_join = other is None
+    if self_join:
+        other = normed
+
+    for row_start in range(0, len(normed), tile_size):
+        row_block = normed[row_start:row_start + tile_size]
+        col_first = row_start if self_join else 0
+        for col_start in range(col_first, len(other), tile_size):
+            scores = row_block @ other[col_start:col_start + tile_size].T
+            if self_join and col_start == row_start:
+                scores[np.tril_indices_from(scores)] = -np.inf  # keep i < j only
+            rows, cols = np.nonzero(scores >= threshold)
+            if len(rows):
+                yield (rows + row_start, cols + col_start,
+                       np.clip(scores[rows, cols], -1.0, 1.0))
+
+
+def similar_pairs(normed, threshold, other=None, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Collects the output of iter_similar_pairs into three flat arrays (rows, cols, sims).
+    """
+    parts = list(iter_similar_pairs(normed, threshold, other, tile_size))
+    if not parts:
+        empty = np.empty(0, dtype=np.intp)
+        return empty, empty.copy(), np.empty(0, dtype=np.float32)
+    rows, cols, sims = zip(*parts)
+    return np.concatenate(rows), np.concatenate(cols), np.concatenate(sims)
@@ -0,0 +1,54 @@
+import time
+import numpy as np
+from loader import simengine, annindex
+
+
+# This script measures how many of the exact (brute-force) near-duplicate pairs the IVF index recovers.
+# It builds a synthetic corpus of clustered embeddings with planted near-duplicates, finds every pair above
+# the threshold with the tiled brute-force engine, and then repeats the search with the ANN index at several
+# n_probe settings. Recall must be judged on data that resembles the real embeddings before lowering n_probe
+# for forensic output: a missed pair is a missed duplicate, while reported pairs are always exact scores.
+# -*- coding: utf-8 -*-
+
+def make_corpus(n_files, dim, n_topics, n_near_dups, noise, seed=0):
+    """
+    Builds clustered unit vectors with `n_near_dups` planted near-duplicate copies.
+    """
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    vectors = topics[rng.integers(0, n_topics, n_files)] + rng.standard_normal((n_files, dim)).astype(np.float32)
+    sources = rng.choice(n_files, n_near_dups, replace=False)
+    targets = rng.choice(n_files, n_near_dups, replace=False)
+    vectors[targets] = vectors[sources] + noise * rng.standard_normal((n_near_dups, dim)).astype(np.float32)
+    return simengine.l2_normalize(vectors)
+
+
+def test_ann_recall(n_files=20000, dim=768, threshold=0.75, probes=(1, 2, 4, 8, 16, 32)):
+    """
+    Prints recall and timing of the IVF index against brute force for each n_probe.
+    """
+    normed = make_corpus(n_files, dim, n_topics=200, n_near_dups=n_files // 20, noise=0.6)
+
+    start = time.perf_counter()
+    rows, cols, _ = simengine.similar_pairs(normed, threshold)
+    brute_time = time.perf_counter() - start
+    truth = set(zip(rows.tolist(), cols.tolist()))
+    print(f"Brute force: {len(truth)} pairs >= {threshold} in {brute_time:.2f}s")
+
+    start = time.perf_counter()
+    index = annindex.IVFIndex().build(normed)
+    print(f"Index build: {len(index.lists)} lists in {time.perf_counter() - start:.2f}s\n")
+
+    print(f"{'n_probe':>8} {'recall':>8} {'time (s)':>9} {'false':>6}")
+    for n_probe in probes:
+        index.n_probe = n_probe
+        start = time.perf_counter()
+        rows, cols, _ = index.similar_pairs(threshold)
+        elapsed = time.perf_counter() - start
+        found = set(zip(rows.tolist(), cols.tolist()))
+        recall = len(found & truth) / len(truth) if truth else 1.0
+        print(f"{n_probe:>8} {recall:>8.4f} {elapsed:>9.2f} {len(found - truth):>6}")
+
+
+if __name__ == "__main__":
+    test_ann_recall()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import numpy as np
+from loader import chunkindex
+
+
+# This script checks content-defined chunking and the chunk index on generated binaries.
+# Chunk boundaries must not depend on how the file is read, must respect the min/max chunk sizes, and must
+# re-synchronise after an insertion so that an edited copy still shares almost all of its chunks with the original.
+# The index is then asked for shared-content ratios between an original, an appended-to copy, a copy with bytes
+# inserted in the middle and an unrelated file.
+# -*- coding: utf-8 -*-
+
+def write_file(folder, name, data):
+    path = os.path.join(folder, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_chunk_boundaries(path):
+    """
+    Verifies chunk sizes and that the chunks do not depend on the read size.
+    """
+    chunks = chunkindex.compute_chunks(path)
+    lengths = [length for length, _ in chunks]
+    assert sum(lengths) == os.path.getsize(path), "Chunks do not cover the file"
+    assert all(chunkindex.CHUNK_MIN_SIZE <= length <= chunkindex.CHUNK_MAX_SIZE for length in lengths[:-1])
+    assert list(chunkindex.iter_chunks(path, read_size=100_003)) == chunks, "Chunks depend on the read size"
+    print(f"{len(chunks)} chunks, average {np.mean(lengths):.0f} bytes [✓]")
+
+
+def test_shared_ratios(folder, size=4_000_000, seed=0):
+    """
+    Compares the index's shared-content ratios with the edits made to each copy.
+    """
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+    files = {
+        "original": write_file(folder, "original.bin", base),
+        "appended": write_file(folder, "appended.bin", base + b"appended" * 4096),
+        "inserted": write_file(folder, "inserted.bin", base[:size // 2] + b"inserted" * 512 + base[size // 2:]),
+        "unrelated": write_file(folder, "unrelated.bin", rng.integers(0, 256, size, dtype=np.uint8).tobytes()),
+    }
+    test_chunk_boundaries(files["original"])
+
+    index = chunkindex.ChunkIndex()
+    for path in files.values():
+        index.add(path, chunkindex.iter_chunks(path))
+
+    found = {(os.path.basename(a), os.path.basename(b)): ratio for a, b, ratio, _ in index.similar_pairs(0.5)}
+    for pair, ratio in sorted(found.items()):
+        print(f"{pair[0]} ~ {pair[1]}: {ratio:.4f} shared")
+    assert found.get(("original.bin", "appended.bin"), 0) > 0.99
+    assert found.get(("original.bin", "inserted.bin"), 0) > 0.95
+    assert not any("unrelated.bin" in pair for pair in found), "Unrelated file reported"
+    print("Shared-content ratios OK [✓]")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as folder:
+        test_shared_ratios(folder)
@@ -1,3 +1,6 @@
+import os
+import time
+
 from loader import pcphash as modules
 
 
@@ -36,6 +39,29 @@ def test_perceptual_hash(image1_path, image2_path):
         print("Decision: Unknown similarity level. [?]")
 
 
+def test_perceptual_hash_folder(folder_path):
+    """
+    Hashes every image in a folder with the batch pHash API and reports throughput and failures.
+    """
+    image_paths = [
+        os.path.join(root, f)
+        for root, _, files in os.walk(folder_path)
+        for f in files
+        if f.lower().endswith((".jpg", ".jpeg", ".png", ".bmp", ".webp"))
+    ]
+
+    start = time.perf_counter()
+    hashes, errors = modules.compute_phash_batch(image_paths)
+    elapsed = time.perf_counter() - start
+
+    print(f"Hashed {len(image_paths) - len(errors)}/{len(image_paths)} images in {elapsed:.2f}s "
+          f"({len(image_paths) / max(elapsed, 1e-9):.1f} images/s)")
+    for i, msg in sorted(errors.items()):
+        print(f"[X] {image_paths[i]}: {msg}")
+    for path, value in zip(image_paths[:5], hashes[:5]):
+        print(f"{modules.int_to_phash(value)}  {path}")
+
+
 if __name__ == "__main__":
     img1 = r"/home/void/Github/AI-Forensic-Duplicate-Detection-CLI/src/ai_model/sample_cases/image3.jpg"
     img2 = r"/home/void/Github/AI-Forensic-Duplicate-Detection-CLI/src/ai_model/sample_cases/image7.jpg"
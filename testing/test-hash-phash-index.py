@@ -0,0 +1,57 @@
+import numpy as np
+from loader import pcphash, phashindex
+
+
+# This script checks the packed pHash helpers and the multi-index pHash radius search against brute force.
+# Packed hashes must round-trip to the 64-character string form, and the batch Hamming distance must agree with
+# the string-based hamming_distance. The index is then compared with an exhaustive pairwise scan on random hashes
+# with planted near-duplicates, at radii served by band probing and by the fallback scan.
+# -*- coding: utf-8 -*-
+
+def test_packed_phash(image_paths):
+    """
+    Verifies packed/string pHash conversion and batch Hamming distance on real images.
+    """
+    strings = [pcphash.compute_phash(path) for path in image_paths]
+    packed = pcphash.pack_phashes(strings)
+
+    for path, hash_str, value in zip(image_paths, strings, packed):
+        assert pcphash.int_to_phash(value) == hash_str, f"Round-trip failed for {path}"
+        assert pcphash.compute_phash_packed(path) == value, f"Packed pHash differs for {path}"
+
+    batch = pcphash.hamming_distance_batch(packed[0], packed)
+    expected = [pcphash.hamming_distance(strings[0], hash_str) for hash_str in strings]
+    assert batch.tolist() == expected, f"Batch distances {batch.tolist()} != {expected}"
+    print(f"Packed pHash OK on {len(image_paths)} images. Distances to first: {expected}")
+
+
+def test_radius_pairs(n_hashes=3000, radii=(0, 4, 8, 11, 20), seed=0):
+    """
+    Compares PHashIndex.radius_pairs with an exhaustive scan.
+    """
+    rng = np.random.default_rng(seed)
+    hashes = rng.integers(0, 2**63, n_hashes, dtype=np.uint64) * np.uint64(2)
+    flips = rng.integers(0, 64, (n_hashes // 10, 3)).astype(np.uint64)
+    near = hashes[:n_hashes // 10] ^ (np.uint64(1) << flips[:, 0]) ^ (np.uint64(1) << flips[:, 1]) ^ (np.uint64(1) << flips[:, 2])
+    hashes = np.concatenate([hashes, near])
+    index = phashindex.PHashIndex(hashes)
+
+    values = hashes.tolist()
+    for radius in radii:
+        expected = {
+            (i, j)
+            for i in range(len(values))
+            for j in range(i + 1, len(values))
+            if bin(values[i] ^ values[j]).count("1") <= radius
+        }
+        rows, cols, _ = index.radius_pairs(radius)
+        found = set(zip(rows.tolist(), cols.tolist()))
+        assert found == expected, f"Radius {radius}: {len(found)} pairs found, {len(expected)} expected"
+        print(f"Radius {radius:>2}: {len(found)} pairs found [✓]")
+
+
+if __name__ == "__main__":
+    sample_dir = r"/home/void/Github/AI-Forensic-Duplicate-Detection-CLI/src/ai_model/sample_cases"
+    images = [f"{sample_dir}/image3.jpg", f"{sample_dir}/image4.jpg", f"{sample_dir}/image5.jpg", f"{sample_dir}/image6.jpg"]
+    test_packed_phash(images)
+    test_radius_pairs()
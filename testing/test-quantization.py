@@ -0,0 +1,61 @@
+import numpy as np
+from loader import quantize, simengine
+
+
+# This script checks the quantized embedding store against float32 on pairs whose cosine similarity lies around
+# the 0.75 duplicate threshold. Vectors are drawn with a few outlier dimensions, like real transformer embeddings,
+# since those stretch the per-vector int8 scale and so its error bound. For float16 and int8 it verifies that every
+# similarity error stays within quantize.cosine_error_bound, prints the largest error actually seen, and counts the
+# pairs whose duplicate / not-duplicate decision flips (only possible within the bound of the threshold).
+# -*- coding: utf-8 -*-
+
+THRESHOLD = 0.75
+
+
+def make_pairs(n_pairs=20000, dim=1536, spread=0.05, seed=0):
+    """
+    Builds (a, b) vector pairs with cosine similarity uniform in THRESHOLD +/- spread.
+
+    Returns:
+        tuple: (a, b, sims) with a and b (n_pairs x dim) float32 and sims the exact similarities.
+    """
+    rng = np.random.default_rng(seed)
+    scale = np.ones(dim)
+    scale[rng.choice(dim, 16, replace=False)] = 3.0  # outlier dimensions
+    a = simengine.l2_normalize(rng.normal(size=(n_pairs, dim)) * scale)
+    noise = rng.normal(size=(n_pairs, dim)) * scale
+    noise -= np.sum(noise * a, axis=1, keepdims=True) * a
+    noise = simengine.l2_normalize(noise)
+    target = rng.uniform(THRESHOLD - spread, THRESHOLD + spread, n_pairs)[:, None]
+    b = (target * a + np.sqrt(1 - target ** 2) * noise).astype(np.float32)
+    sims = np.einsum("ij,ij->i", a.astype(np.float64), b.astype(np.float64))
+    sims /= np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    return a, b, sims
+
+
+def test_error_bound(a, b, sims, dtype):
+    """
+    Compares decoded similarities with the exact ones and checks them against the documented bound.
+    """
+    qa = quantize.QuantizedMatrix.from_float(a, dtype)
+    qb = quantize.QuantizedMatrix.from_float(b, dtype)
+    decoded = np.einsum("ij,ij->i", qa[:].astype(np.float64), qb[:].astype(np.float64))
+    errors = np.abs(decoded - sims)
+    bounds = quantize.cosine_error_bound(decoded, qa.angle_error(), qb.angle_error())
+    flips = np.count_nonzero((decoded >= THRESHOLD) != (sims >= THRESHOLD))
+
+    ratio = a.nbytes / qa.nbytes
+    peak = np.max(np.abs(a), axis=1) * np.sqrt(a.shape[1])
+    print(f"{dtype}: {ratio:.1f}x smaller than float32, max error {errors.max():.2e}, "
+          f"mean error {errors.mean():.2e}, max bound {bounds.max():.2e} (peak ratio up to {peak.max():.1f}), "
+          f"{flips} decisions flipped")
+    assert np.all(errors <= bounds + 1e-6), f"{dtype}: error above the documented bound"
+    flipped = (decoded >= THRESHOLD) != (sims >= THRESHOLD)
+    assert np.all(np.abs(sims - THRESHOLD)[flipped] <= bounds[flipped]), "Decision flipped outside the bound"
+    print(f"{dtype}: every error within the bound [✓]")
+
+
+if __name__ == "__main__":
+    a, b, sims = make_pairs()
+    for dtype in ("float16", "int8"):
+        test_error_bound(a, b, sims, dtype)
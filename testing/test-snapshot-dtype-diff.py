@@ -0,0 +1,71 @@
+import tempfile
+import numpy as np
+from loader import daily_snapshot
+
+
+# This script checks that diffing snapshots stored at different embedding dtypes does not report quantization
+# error as a change. A float32 snapshot of generated AI entries is written, then int8 and float16 snapshots of the
+# same unchanged tree (entries reused from the float32 one, as an incremental run does). Diffing them against the
+# float32 snapshot, in both directions, must report nothing; after editing one embedding and moving a file, that
+# file must still be reported as MODIFIED and the move as a clean MOVED.
+# -*- coding: utf-8 -*-
+
+def make_entries(n_files=500, dim=768, seed=0):
+    """
+    Builds {path: entry} AI entries with random embeddings, partial digests and stat keys.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        f"/data/folder/file_{i:04d}.txt": {
+            "mode": "AI",
+            "value": rng.normal(size=dim).astype(np.float32),
+            "partial": f"{i:064x}",
+            "stat": (200_000 + i, 1_700_000_000_000_000_000 + i, 1000 + i),
+        }
+        for i in range(n_files)
+    }
+
+
+def write(entries, name, dtype):
+    paths = sorted(entries, key=daily_snapshot.snapshot_sort_key)
+    daily_snapshot.write_snapshot(((path, entries[path]) for path in paths), name, dtype)
+
+
+def diff(prev_name, current_name):
+    return list(daily_snapshot.iter_snapshot_diff(daily_snapshot.iter_snapshot(prev_name),
+                                                  daily_snapshot.iter_snapshot(current_name)))
+
+
+def test_unchanged_tree(dtype):
+    """
+    An unchanged tree stored as float32 and as `dtype` must diff clean both ways.
+    """
+    reused = dict(daily_snapshot.iter_snapshot("base.snap"))
+    write(reused, f"same_{dtype}.snap", dtype)
+    changes = diff("base.snap", f"same_{dtype}.snap") + diff(f"same_{dtype}.snap", "base.snap")
+    assert not changes, f"float32 vs {dtype}: unchanged files reported: {changes[:3]}"
+    print(f"float32 vs {dtype}: unchanged tree, no changes [✓]")
+
+
+def test_real_changes(dtype):
+    """
+    An edited embedding is still MODIFIED and a moved unchanged file a clean MOVED across dtypes.
+    """
+    current = dict(daily_snapshot.iter_snapshot("base.snap"))
+    edited = "/data/folder/file_0007.txt"
+    current[edited] = dict(current[edited], value=np.array(current[edited]["value"]) + 0.05)
+    current["/data/moved/file_0009.txt"] = current.pop("/data/folder/file_0009.txt")
+    write(current, f"changed_{dtype}.snap", dtype)
+    changes = dict(diff("base.snap", f"changed_{dtype}.snap"))
+    assert changes.get(edited, "").startswith("MODIFIED"), f"Edit not reported: {changes.get(edited)}"
+    assert changes.get("/data/moved/file_0009.txt") == "MOVED (from /data/folder/file_0009.txt)", changes
+    assert len(changes) == 2, f"Unexpected changes: {changes}"
+    print(f"float32 vs {dtype}: edit and move reported [✓]")
+
+
+if __name__ == "__main__":
+    daily_snapshot.SNAPSHOT_DIR = tempfile.mkdtemp()
+    write(make_entries(), "base.snap", "float32")
+    for dtype in ("int8", "float16"):
+        test_unchanged_tree(dtype)
+        test_real_changes(dtype)